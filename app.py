@@ -1,16 +1,140 @@
-import subprocess
-import pandas as pd
-from sqlalchemy import create_engine
-from flask import Flask, render_template, request, jsonify
-from datetime import datetime, timedelta
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context, url_for
+from datetime import date, datetime, timedelta
+from werkzeug.security import safe_join
+import json
+import sqlite3
+import threading
+import time
+from werkzeug.utils import secure_filename
 import os
+from schedule_cache import ScheduleCache
+from schedule_store import ScheduleStore
+from jobs import UpdateRunner
+from availability import Availability
+import artifacts
+import availability
+import http_cache
+import ical
+import metrics
+import schedule_db
 
-DB_URL = 'sqlite:///plan.db'
-TABLE_NAME = 'schedule_entries'
+# Limit liczby wpisów (nie bajtów) wspólny dla tygodni, odpowiedzi API, kalendarzy i wydruków
+# wszystkich lat; przy kilku latach najrzadziej używane wpisy są usuwane (LRU).
+# Wyniki wyszukiwania nie trafiają tu wcale (zob. api_search)
+CACHE_SIZE = 1024
+
+# Przeglądarka może używać odpowiedzi API przez 5 minut, potem pyta z If-None-Match
+API_CACHE_CONTROL = 'public, max-age=300'
+API_MAX_RANGE_DAYS = 366
+# Rok studiów z parametru trafia do zapytań SQLite; wartość spoza zakresu to błąd klienta, nie 500
+MAX_YEAR = 20
+YEAR_ERROR = f"'year' must be an integer between 1 and {MAX_YEAR}."
+SEARCH_DEFAULT_LIMIT = 200
+# Strumień zmian sprawdza wersję planu co kilka sekund; po kilku minutach kończy się,
+# a EventSource łączy się ponownie z Last-Event-ID, więc worker nie jest zajęty bez końca
+CHANGES_POLL_SECONDS = 5
+CHANGES_HEARTBEAT_SECONDS = 15
+CHANGES_STREAM_SECONDS = 300
+# Każdy otwarty strumień zajmuje wątek workera przez CHANGES_STREAM_SECONDS; limit musi być
+# wyraźnie niższy niż `threads` w gunicorn.conf.py, inaczej strumienie zablokują całą stronę
+CHANGES_MAX_STREAMS = int(os.environ.get('CHANGES_MAX_STREAMS', 2))
+CHANGES_BUSY_RETRY_SECONDS = 60
+SEARCH_MAX_LIMIT = 1000
+# Kalendarze odpytują feed rzadko; zmiana planu zmienia ETag
+CALENDAR_CACHE_CONTROL = 'public, max-age=3600'
+PRINT_CACHE_CONTROL = 'public, max-age=3600'
 
 app = Flask(__name__)
-engine = create_engine(DB_URL)
-ENTRIES = []
+# Szablony skompilowane przy poprzednim starcie lub w kroku budowania (render.yaml: `flask --app app precompile`)
+app.jinja_env.bytecode_cache = artifacts.bytecode_cache('app')
+schedule_cache = ScheduleCache(maxsize=CACHE_SIZE)
+change_streams = threading.BoundedSemaphore(CHANGES_MAX_STREAMS)
+# Cały plan (kilka tysięcy wierszy) trzymany jest w pamięci każdego workera
+schedule_store = ScheduleStore()
+schedule_store.reload()
+# Maski zajętości grup liczone ze snapshotu magazynu, raz na wersję planu
+schedule_availability = Availability(schedule_store)
+
+last_successful_update = None
+
+def run_update(report):
+    global last_successful_update
+    # Import przy pierwszym zadaniu; kolejne korzystają z już załadowanych modułów
+    import update
+    try:
+        update.main(report)
+    finally:
+        for phase in report.phases:
+            metrics.UPDATE_PHASE_SECONDS.observe(phase['seconds'], phase['name'])
+        metrics.UPDATE_RUNS.inc(report.outcome or 'error')
+        metrics.ROWS_PARSED.inc(amount=report.rows.get('parsed', 0))
+        if report.outcome in ('updated', 'unchanged'):
+            last_successful_update = time.time()
+
+update_runner = UpdateRunner(run_update)
+
+def plan_age_seconds():
+    published_at = schedule_db.get_meta_value('published_at')
+    if not published_at:
+        return None
+    return round(time.time() - datetime.fromisoformat(published_at).timestamp(), 3)
+
+metrics.CallbackCounter('schedule_cache_hits_total', "Schedule cache hits.", lambda: schedule_cache.hits)
+metrics.CallbackCounter('schedule_cache_misses_total', "Schedule cache misses.", lambda: schedule_cache.misses)
+metrics.Gauge('schedule_cache_entries', "Entries held in the schedule cache.", lambda: schedule_cache.stats()['size'])
+metrics.Gauge('schedule_store_rows', "Entries held in this worker's in-memory schedule store.",
+              lambda: schedule_store.stats()['rows'])
+metrics.Gauge('schedule_store_bytes', "Approximate memory used by the in-memory schedule store.",
+              lambda: schedule_store.stats()['bytes'])
+metrics.Gauge('sqlite_read_connections', "Read-only SQLite connections open in this worker (one per thread).",
+              schedule_db.connection_count)
+metrics.Gauge('plan_age_seconds', "Seconds since the current plan version was published.", plan_age_seconds)
+metrics.Gauge('update_last_success_age_seconds', "Seconds since the last successful update run of this process.",
+              lambda: None if last_successful_update is None else round(time.time() - last_successful_update, 3))
+
+@app.cli.command('precompile')
+def precompile_assets():
+    """Compiles every template into the bytecode caches and fingerprints the static files."""
+    templates = app.jinja_env.list_templates()
+    for name in templates:
+        app.jinja_env.get_template(name)
+    templates += artifacts.precompile_templates()
+    assets = 0
+    for folder, _, files in os.walk(app.static_folder):
+        for filename in files:
+            assets += http_cache.asset_fingerprint(os.path.join(folder, filename)) is not None
+    print(f"{len(templates)} templates compiled into {artifacts.JINJA_CACHE_DIR}, {assets} static files fingerprinted")
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    # url_for('static', ...) dostaje ?v=<hash treści>, więc nowa wersja pliku ma nowy adres
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        path = safe_join(app.static_folder, values['filename'])
+        fingerprint = path and http_cache.asset_fingerprint(path)
+        if fingerprint:
+            values['v'] = fingerprint
+
+@app.after_request
+def cache_fingerprinted_static(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        path = safe_join(app.static_folder, request.view_args.get('filename', ''))
+        if path and request.args.get('v') == http_cache.asset_fingerprint(path):
+            response.headers['Cache-Control'] = http_cache.ASSET_CACHE_CONTROL
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Szablon trasy zamiast ścieżki, żeby liczba serii była stała
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method)
+        metrics.REQUESTS.inc(route, request.method, str(response.status_code))
+    return response
 
 def get_current_week():
     today = datetime.now()
@@ -30,15 +154,52 @@ def get_last_update_date():
         return "Brak danych"
     return "Brak danych"
 
+def parse_year(value):
+    """Parses a year-of-study parameter (1..MAX_YEAR); a missing value means the default year."""
+    if not value:
+        return schedule_db.DEFAULT_YEAR
+    year = int(value)
+    if not 1 <= year <= MAX_YEAR:
+        raise ValueError(value)
+    return year
+
+def available_groups(version):
+    """Returns {year: [group numbers]} of the published plan, cached per plan version."""
+    groups = schedule_cache.get(version, ('groups',))
+    if groups is None:
+        with metrics.DB_SECONDS.time('fetch_groups'):
+            groups = schedule_db.fetch_groups()
+        schedule_cache.put(version, ('groups',), groups)
+    return groups
+
+def load_schedule_view(version, year, group_number, start_date, end_date):
+    """Returns the prebuilt view for a whole week if there is one, otherwise renders it from the database."""
+    if version is not None and start_date.weekday() == 0 and end_date == start_date + timedelta(days=6):
+        with metrics.DB_SECONDS.time('load_view'):
+            view = artifacts.load_view(version, year, group_number, start_date)
+        if view is not None:
+            return view
+    with metrics.DB_SECONDS.time('store_fetch'):
+        entries = schedule_store.fetch(version, year, group_number, start_date, end_date)
+    with metrics.STAGE_SECONDS.time('transform'):
+        return artifacts.render_view(entries)
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     group_number = request.form.get('group_number', '7')
+    try:
+        year = parse_year(request.form.get('year'))
+    except ValueError:
+        year = schedule_db.DEFAULT_YEAR
     start_date_str = request.form.get('start_date', None)
     end_date_str = request.form.get('end_date', None)
 
     if start_date_str and end_date_str:
-        current_start_date = pd.to_datetime(start_date_str)
-        current_end_date = pd.to_datetime(end_date_str)
+        try:
+            current_start_date = datetime.fromisoformat(start_date_str)
+            current_end_date = datetime.fromisoformat(end_date_str)
+        except ValueError:
+            current_start_date, current_end_date = get_current_week()
     else:
         current_start_date, current_end_date = get_current_week()
 
@@ -50,48 +211,430 @@ def index():
             current_start_date += timedelta(weeks=1)
             current_end_date += timedelta(weeks=1)
 
-    query = f"""
-    SELECT * FROM {TABLE_NAME}
-    WHERE date >= '{current_start_date.date()}'
-      AND date <= '{current_end_date.date()}'
-      AND group_number = '{group_number}'
-    """
-
-    schedule_entries = pd.read_sql(query, engine)
-    schedule_entries['date'] = pd.to_datetime(schedule_entries['date']).dt.date
+    key = (year, group_number, current_start_date.date(), current_end_date.date())
+    with metrics.STAGE_SECONDS.time('query'):
+        version = schedule_db.get_plan_version()
+        schedule = schedule_cache.get(version, key)
+        if schedule is None:
+            schedule = load_schedule_view(version, *key)
+            schedule_cache.put(version, key, schedule)
+        groups_by_year = available_groups(version)
 
-    if schedule_entries.empty:
+    if not schedule.entry_count:
         error_message = "Brak zajęć dla wybranej grupy w wybranym tygodniu."
     else:
         error_message = None
 
-    ENTRIES = schedule_entries.to_dict('records')
-
-    for entry_id, entry in enumerate(ENTRIES):
-        entry["id"] = entry_id
-
     last_update_date = get_last_update_date()
-    return render_template('index.html',
-                           schedule_entries=ENTRIES,
-                           group_number=group_number,
-                           start_date=current_start_date,
-                           end_date=current_end_date,
-                           error_message=error_message,
-                           last_update_date=last_update_date,
-                           timedelta=timedelta)
-
-@app.route('/update', methods=['GET'])
+    with metrics.STAGE_SECONDS.time('render'):
+        return render_template('index.html',
+                               schedule=schedule,
+                               year=year,
+                               years=sorted(set(groups_by_year) | {year}),
+                               groups=groups_by_year.get(year) or [str(group) for group in range(1, 16)],
+                               group_number=group_number,
+                               start_date=current_start_date,
+                               end_date=current_end_date,
+                               error_message=error_message,
+                               last_update_date=last_update_date,
+                               timedelta=timedelta)
+
+@app.route('/update', methods=['GET', 'POST'])
 def update_schedule():
+    job, created = update_runner.submit()
+    return jsonify({
+        "status": "accepted" if created else "already_running",
+        "job_id": job.id,
+        "status_url": url_for('update_status', job_id=job.id),
+    }), 202
+
+@app.route('/update/<job_id>', methods=['GET'])
+def update_status(job_id):
+    job = update_runner.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown update job."}), 404
+    return jsonify(job.to_dict())
+
+def api_error(message, status=400):
+    return jsonify({"status": "error", "message": message}), status
+
+def parse_api_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return date.fromisoformat(value)
+
+# Parsery parametrów zapytań API zgłaszają ValueError z komunikatem dla klienta (zob. api_error)
+
+def parse_year_arg():
+    """The `year` query parameter (default: DEFAULT_YEAR)."""
+    try:
+        return parse_year(request.args.get('year'))
+    except ValueError:
+        raise ValueError(YEAR_ERROR)
+
+def parse_groups_arg():
+    """Comma-separated `groups` as a sorted tuple without duplicates; empty means all groups."""
+    return tuple(sorted({group.strip() for group in request.args.get('groups', '').split(',') if group.strip()}))
+
+def parse_date_range(required=True):
+    """
+    `start` and `end` ISO dates. When required, both must be given and `end` must be
+    on or after `start` and at most API_MAX_RANGE_DAYS later; otherwise either may be None.
+    """
+    try:
+        start_date = parse_api_date('start')
+        end_date = parse_api_date('end')
+    except ValueError:
+        raise ValueError("'start' and 'end' must be ISO dates (YYYY-MM-DD).")
+    if required:
+        if start_date is None or end_date is None:
+            raise ValueError("Missing 'start' or 'end' parameter.")
+        if end_date < start_date or (end_date - start_date).days > API_MAX_RANGE_DAYS:
+            raise ValueError(f"'end' must be on or after 'start' and at most {API_MAX_RANGE_DAYS} days later.")
+    return start_date, end_date
+
+def json_body(payload):
+    """Compact UTF-8 JSON of an API payload."""
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def cached_response(version, key, mimetype, cache_control, build, store=True):
+    """
+    Serves a body that depends only on the plan version and key. The strong ETag is
+    derived from both, so a matching If-None-Match is answered with 304 before
+    anything is read or rendered; otherwise build() runs once per version and its
+    encoded (and lazily compressed) result is kept in the shared cache. With
+    store=False the body is built on every full response and never cached.
+    """
+    etag = http_cache.make_etag(version, *key)
+    if http_cache.matches(request.if_none_match, etag):
+        response = Response(status=304)
+        encoding = http_cache.choose_encoding(request.accept_encodings)
+    else:
+        body = schedule_cache.get(version, key) if store else None
+        if body is None:
+            with metrics.STAGE_SECONDS.time('serialize'):
+                body = http_cache.EncodedBody(build())
+            if store:
+                schedule_cache.put(version, key, body)
+        encoding, data = body.get(http_cache.choose_encoding(request.accept_encodings))
+        response = Response(data, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(http_cache.variant_etag(etag, encoding))
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+def schedule_api_response(year, group_number, start_date, end_date):
+    """Returns the entries of a group of a year between two dates as JSON."""
+    version = schedule_db.get_plan_version()
+
+    def build():
+        with metrics.DB_SECONDS.time('store_fetch'):
+            entries = schedule_store.fetch(version, year, group_number, start_date, end_date)
+        payload = {
+            "year": year,
+            "group_number": group_number,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "plan_version": version,
+            "entries": [entry.to_dict() for entry in entries],
+        }
+        return json_body(payload)
+
+    return cached_response(version, ('api', year, group_number, start_date, end_date),
+                           'application/json', API_CACHE_CONTROL, build)
+
+@app.route('/api/schedule', methods=['GET'])
+def api_schedule():
+    """Entries of one group for the week containing `week` (any ISO date; default: current week)."""
+    group_number = request.args.get('group')
+    if not group_number:
+        return api_error("Missing 'group' parameter.")
+    try:
+        year = parse_year_arg()
+    except ValueError as e:
+        return api_error(str(e))
+    try:
+        day = parse_api_date('week') or get_current_week()[0].date()
+    except ValueError:
+        return api_error("'week' must be an ISO date (YYYY-MM-DD).")
+    start_date = artifacts.week_start(day)
+    return schedule_api_response(year, group_number, start_date, start_date + timedelta(days=6))
+
+@app.route('/api/schedule/range', methods=['GET'])
+def api_schedule_range():
+    """Entries of one group between `start` and `end` (inclusive ISO dates)."""
+    group_number = request.args.get('group')
+    if not group_number:
+        return api_error("Missing 'group' parameter.")
+    try:
+        year = parse_year_arg()
+        start_date, end_date = parse_date_range()
+    except ValueError as e:
+        return api_error(str(e))
+    return schedule_api_response(year, group_number, start_date, end_date)
+
+def parse_availability_args():
+    """
+    Common parameters of the availability endpoints: year, comma-separated `groups`
+    (default: all groups of the year), `start` and `end` ISO dates.
+    Raises ValueError with a message for the client.
+    """
+    return (parse_year_arg(), parse_groups_arg()) + parse_date_range()
+
+def availability_response(name, params, query):
+    """Runs an availability query once per plan version and parameters; unknown groups give 404."""
+    version = schedule_db.get_plan_version()
+    year, groups, start_date, end_date = params[:4]
+    index = schedule_availability.index(version)
+    try:
+        index.check_groups(year, groups)
+    except ValueError as e:
+        return api_error(str(e), 404)
+
+    def build():
+        with metrics.DB_SECONDS.time(name):
+            days = query(index)
+        payload = {
+            "year": year,
+            "groups": list(groups) or index.groups.get(year, []),
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "plan_version": version,
+            "days": days,
+        }
+        return json_body(payload)
+
+    return cached_response(version, (name,) + params, 'application/json', API_CACHE_CONTROL, build)
+
+@app.route('/api/free', methods=['GET'])
+def api_free():
+    """
+    Windows in which all given groups are free: at least `min` minutes (default 30)
+    between `from` and `to` (default 08:00-20:00), weekdays only unless `weekends=1`.
+    """
+    try:
+        params = parse_availability_args()
+    except ValueError as e:
+        return api_error(str(e))
+    try:
+        day_start = availability.parse_minutes(request.args.get('from', availability.minute_label(availability.DAY_START)))
+        day_end = availability.parse_minutes(request.args.get('to', availability.minute_label(availability.DAY_END)))
+        min_minutes = int(request.args.get('min') or availability.MIN_FREE_MINUTES)
+    except ValueError:
+        return api_error("'from' and 'to' must be times (HH:MM) and 'min' a number of minutes.")
+    if day_end <= day_start or min_minutes < 1:
+        return api_error("'to' must be later than 'from' and 'min' at least 1.")
+    weekends = request.args.get('weekends') == '1'
+
+    def query(index):
+        return [{"date": day.isoformat(),
+                 "windows": [{"start": availability.minute_label(start), "end": availability.minute_label(end)}
+                             for start, end in windows]}
+                for day, windows in index.free_windows(*params, day_start, day_end, min_minutes, weekends)]
+
+    return availability_response('free_windows', params + (day_start, day_end, min_minutes, weekends), query)
+
+@app.route('/api/overlaps', methods=['GET'])
+def api_overlaps():
+    """Windows in which at least two of the given groups have classes at the same time."""
+    try:
+        params = parse_availability_args()
+    except ValueError as e:
+        return api_error(str(e))
+
+    def query(index):
+        return [{"date": day.isoformat(),
+                 "windows": [{"start": availability.minute_label(start), "end": availability.minute_label(end),
+                              "groups": busy} for start, end, busy in windows]}
+                for day, windows in index.overlaps(*params)]
+
+    return availability_response('overlaps', params, query)
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    """
+    Entries of a year whose subject contains every word of `q` as a word prefix,
+    case- and diacritic-insensitive; optional comma-separated `groups`, `start`/`end`
+    ISO dates and `limit` (default 200, at most 1000).
+    """
+    query = ' '.join(request.args.get('q', '').split())
+    if not query:
+        return api_error("Missing 'q' parameter.")
+    groups = parse_groups_arg()
+    try:
+        year = parse_year_arg()
+        start_date, end_date = parse_date_range(required=False)
+    except ValueError as e:
+        return api_error(str(e))
+    try:
+        limit = int(request.args.get('limit') or SEARCH_DEFAULT_LIMIT)
+    except ValueError:
+        return api_error("'limit' must be an integer.")
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        return api_error(f"'limit' must be between 1 and {SEARCH_MAX_LIMIT}.")
+    version = schedule_db.get_plan_version()
+
+    def build():
+        with metrics.DB_SECONDS.time('search'):
+            # Jeden wiersz ponad limit mówi, czy wynik został obcięty
+            entries = schedule_db.search_entries(query, year, groups, start_date, end_date, limit + 1)
+        payload = {
+            "query": query,
+            "year": year,
+            "groups": list(groups),
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "plan_version": version,
+            "truncated": len(entries) > limit,
+            "entries": [entry.to_dict() for entry in entries[:limit]],
+        }
+        return json_body(payload)
+
+    # Zapytania są dowolne, więc ich wyniki wypierałyby z cache widoki tygodni; zostaje ETag/304
+    try:
+        return cached_response(version, ('search', query, year, groups, start_date, end_date, limit),
+                               'application/json', API_CACHE_CONTROL, build, store=False)
+    except sqlite3.OperationalError:
+        return api_error("Search index is not available yet.", 503)
+
+def changes_payload(year, group_number, since, version):
+    """
+    Changes of one group in the plan versions after `since`. `complete` is false when
+    older versions were already dropped from the history (the client should reload
+    everything instead of applying the deltas).
+    """
+    changes_from = schedule_db.get_meta_value('changes_from')
+    return {
+        "year": year,
+        "group_number": group_number,
+        "since": since,
+        "plan_version": version,
+        "complete": changes_from is not None and since + 1 >= int(changes_from),
+        "changes": [dict(version=change_version, published_at=published_at, **changes)
+                    for change_version, published_at, changes
+                    in schedule_db.fetch_changes(group_number, since, year=year)],
+    }
+
+def parse_changes_args():
+    """Returns (year, group_number, since or None) of a changes request; raises ValueError with a message."""
+    group_number = request.args.get('group')
+    if not group_number:
+        raise ValueError("Missing 'group' parameter.")
+    year = parse_year_arg()
+    since = request.args.get('since') or request.headers.get('Last-Event-ID')
     try:
-        result = subprocess.run(["python", "update.py"], capture_output=True, text=True, timeout=300)
-        if result.returncode == 0:
-            return jsonify({"status": "success", "message": "Update executed successfully.", "output": result.stdout})
-        else:
-            return jsonify({"status": "error", "message": "Update script failed.", "error": result.stderr}), 500
-    except subprocess.TimeoutExpired:
-        return jsonify({"status": "error", "message": "Update script timed out after 5 minutes."}), 500
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        since = int(since) if since else None
+    except ValueError:
+        raise ValueError("'since' must be a plan version number.")
+    return year, group_number, since
+
+@app.route('/api/changes', methods=['GET'])
+def api_changes():
+    """
+    What changed for one group since plan version `since` (default: the previous
+    version): added, removed and moved lessons plus the weeks they fall in.
+    """
+    try:
+        year, group_number, since = parse_changes_args()
+    except ValueError as e:
+        return api_error(str(e))
+    version = schedule_db.get_plan_version()
+    current = int(version or 0)
+    if since is None:
+        since = max(current - 1, 0)
+
+    def build():
+        with metrics.DB_SECONDS.time('fetch_changes'):
+            payload = changes_payload(year, group_number, since, version)
+        return json_body(payload)
+
+    return cached_response(version, ('changes', year, group_number, since), 'application/json',
+                           API_CACHE_CONTROL, build)
+
+@app.route('/api/changes/stream', methods=['GET'])
+def api_changes_stream():
+    """
+    Server-Sent Events: one `changes` event (id = plan version) per new plan version,
+    carrying the group's changes; resumes from Last-Event-ID or `since` on reconnect.
+    At most CHANGES_MAX_STREAMS streams are open per worker; beyond that the answer is 503.
+    """
+    try:
+        year, group_number, since = parse_changes_args()
+    except ValueError as e:
+        return api_error(str(e))
+    if since is None:
+        since = int(schedule_db.get_plan_version() or 0)
+    if not change_streams.acquire(blocking=False):
+        # Komplet strumieni: klient ma spróbować ponownie później, zamiast zająć kolejny wątek
+        response = Response(f"retry: {CHANGES_BUSY_RETRY_SECONDS * 1000}\n\n", status=503,
+                            mimetype='text/event-stream')
+        response.headers['Retry-After'] = str(CHANGES_BUSY_RETRY_SECONDS)
+        return response
+
+    def events(since):
+        yield f"retry: {int(CHANGES_POLL_SECONDS * 1000)}\n\n"
+        started = last_sent = time.monotonic()
+        while time.monotonic() - started < CHANGES_STREAM_SECONDS:
+            version = schedule_db.get_plan_version()
+            if version is not None and int(version) > since:
+                payload = changes_payload(year, group_number, since, version)
+                data = json_body(payload).decode('utf-8')
+                yield f"id: {version}\nevent: changes\ndata: {data}\n\n"
+                since = int(version)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= CHANGES_HEARTBEAT_SECONDS:
+                yield ": ping\n\n"
+                last_sent = time.monotonic()
+            time.sleep(CHANGES_POLL_SECONDS)
+
+    response = Response(stream_with_context(events(since)), mimetype='text/event-stream')
+    # Miejsce zwalnia zamknięcie odpowiedzi, także gdy klient rozłączy się przed pierwszym zdarzeniem
+    response.call_on_close(change_streams.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/calendar/<group_number>.ics', methods=['GET'], defaults={'year': schedule_db.DEFAULT_YEAR})
+@app.route('/calendar/<int:year>/<group_number>.ics', methods=['GET'])
+def calendar_feed(year, group_number):
+    """Subscribable iCalendar feed with every entry of one group, built once per plan version."""
+    if not 1 <= year <= MAX_YEAR:
+        return api_error(YEAR_ERROR)
+    version = schedule_db.get_plan_version()
+
+    def build():
+        with metrics.DB_SECONDS.time('fetch_group_entries'):
+            entries = schedule_db.fetch_group_entries(group_number, year=year)
+        return ical.build_calendar(group_number, entries, schedule_db.get_meta_value('published_at'), year)
+
+    response = cached_response(version, ('ics', year, group_number), 'text/calendar', CALENDAR_CACHE_CONTROL, build)
+    filename = secure_filename(f"plan-rok-{year}-grupa-{group_number}.ics")
+    response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
+    return response
+
+@app.route('/print/<group_number>.html', methods=['GET'], defaults={'year': schedule_db.DEFAULT_YEAR})
+@app.route('/print/<int:year>/<group_number>.html', methods=['GET'])
+def printable_schedule(year, group_number):
+    """Printable page with the whole semester of one group, rendered at publish time."""
+    if not 1 <= year <= MAX_YEAR:
+        return api_error(YEAR_ERROR)
+    version = schedule_db.get_plan_version()
+    with metrics.DB_SECONDS.time('load_printable'):
+        printable = artifacts.load_printable(version, year, group_number) if version else None
+    if printable is None:
+        return api_error("No printable schedule for this group.", 404)
+    # Klucz zawiera wersję wydruku: po dorenderowaniu bieżącej wersji cache nie poda starego
+    artifact_version, html = printable
+    return cached_response(version, ('print', year, group_number, artifact_version), 'text/html',
+                           PRINT_CACHE_CONTROL, lambda: html.encode('utf-8'))
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics of this process."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
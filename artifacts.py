@@ -0,0 +1,263 @@
+import gzip
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import timedelta
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+import schedule_db
+
+ARTIFACTS_TABLE = 'render_artifacts'
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+# Skompilowane szablony trzymane na dysku: po restarcie workera (cold start) nie trzeba ich
+# kompilować od nowa; `flask --app app precompile` wypełnia katalog już przy buildzie
+JINJA_CACHE_DIR = os.environ.get(
+    'JINJA_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jinja_cache'))
+
+CREATE_ARTIFACTS_SQL = f"""
+CREATE TABLE IF NOT EXISTS {ARTIFACTS_TABLE} (
+    version INTEGER,
+    year INTEGER,
+    group_number TEXT,
+    week_start TEXT,
+    entry_count INTEGER,
+    entries_json BLOB,
+    mobile_html BLOB,
+    desktop_html BLOB,
+    PRIMARY KEY (version, year, group_number, week_start)
+)
+"""
+
+# Cały semestr grupy na jednej stronie do druku, gotowy (gzip) dla każdej wersji planu
+PRINT_TABLE = 'print_artifacts'
+
+CREATE_PRINT_SQL = f"""
+CREATE TABLE IF NOT EXISTS {PRINT_TABLE} (
+    version INTEGER,
+    year INTEGER,
+    group_number TEXT,
+    html BLOB,
+    PRIMARY KEY (version, year, group_number)
+)
+"""
+
+# Najnowsza wyrenderowana wersja nie starsza niż bieżąca: zaraz po publikacji, zanim
+# skończy się renderowanie, serwowany jest jeszcze poprzedni wydruk
+SELECT_PRINT_SQL = (
+    f"SELECT version, html FROM {PRINT_TABLE} "
+    "WHERE year = ? AND group_number = ? AND version <= ? ORDER BY version DESC LIMIT 1"
+)
+
+DAY_NAMES = ('PONIEDZIAŁEK', 'WTOREK', 'ŚRODA', 'CZWARTEK', 'PIĄTEK', 'SOBOTA', 'NIEDZIELA')
+
+SELECT_VIEW_SQL = (
+    f"SELECT entry_count, mobile_html, desktop_html FROM {ARTIFACTS_TABLE} "
+    "WHERE version = ? AND year = ? AND group_number = ? AND week_start = ?"
+)
+
+def bytecode_cache(name):
+    """
+    Returns a bytecode cache in JINJA_CACHE_DIR/<name>, or None if the directory is not
+    writable. Every Jinja environment needs its own: bytecode depends on its settings.
+    """
+    directory = os.path.join(JINJA_CACHE_DIR, name)
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return None
+    return FileSystemBytecodeCache(directory) if os.access(directory, os.W_OK) else None
+
+
+# Te same szablony renderuje aplikacja i update.py, więc nie zależą od kontekstu Flaska
+_env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=select_autoescape(),
+                   bytecode_cache=bytecode_cache('artifacts'))
+
+
+def precompile_templates():
+    """Compiles the partials and print pages into the bytecode cache; returns their names."""
+    names = _env.list_templates(filter_func=lambda name: name.startswith(('partials/', 'print/')))
+    for name in names:
+        _env.get_template(name)
+    return names
+
+
+@dataclass(frozen=True)
+class ScheduleView:
+    """Rendered schedule of one group for one week, ready to be embedded in index.html."""
+    entry_count: int
+    mobile_html: str
+    desktop_html: str
+
+
+def week_start(day):
+    """Returns the Monday of the week containing day."""
+    return day - timedelta(days=day.weekday())
+
+
+def group_by_day(entries):
+    """Groups entries by their `day` name, keeping their order within each day."""
+    by_day = {}
+    for entry in entries:
+        by_day.setdefault(entry.day, []).append(entry)
+    return by_day
+
+
+def render_view(entries):
+    """Renders the mobile and desktop day columns for a list of ScheduleEntry objects."""
+    by_day = group_by_day(entries)
+    return ScheduleView(
+        entry_count=len(entries),
+        mobile_html=_env.get_template('partials/mobile_days.html').render(entries_by_day=by_day),
+        desktop_html=_env.get_template('partials/desktop_days.html').render(entries_by_day=by_day),
+    )
+
+
+def entries_by_day_json(entries):
+    """Serializes entries grouped by day to compact JSON."""
+    by_day = {
+        day: [entry.to_dict() for entry in day_entries]
+        for day, day_entries in group_by_day(entries).items()
+    }
+    return json.dumps(by_day, ensure_ascii=False, separators=(',', ':'))
+
+
+def build_artifacts(version, db_path=schedule_db.DB_PATH):
+    """
+    Renders the view of every group of every year for every week of the
+    published plan and stores it, together with the entries grouped by day,
+    under the plan version.
+    Artifacts of older versions are removed. Returns the number of stored
+    artifacts (0 if this version was already built).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            # Tabela sprzed podziału na lata nie ma kolumny year; to tylko cache, więc budujemy ją od nowa
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({ARTIFACTS_TABLE})")}
+            if columns and 'year' not in columns:
+                conn.execute(f"DROP TABLE {ARTIFACTS_TABLE}")
+            conn.execute(CREATE_ARTIFACTS_SQL)
+        if conn.execute(f"SELECT 1 FROM {ARTIFACTS_TABLE} WHERE version = ? LIMIT 1", (version,)).fetchone():
+            return 0
+
+        by_year = {}
+        for entry in schedule_db.fetch_all_entries(conn):
+            by_year.setdefault(entry.year, {}).setdefault(
+                (entry.group_number, week_start(entry.date)), []).append(entry)
+
+        records = []
+        for year, by_group_week in by_year.items():
+            groups = sorted({group for group, _ in by_group_week}, key=lambda g: (len(g), g))
+            monday = min(monday for _, monday in by_group_week)
+            last_week = max(monday for _, monday in by_group_week)
+            while monday <= last_week:
+                for group in groups:
+                    entries = by_group_week.get((group, monday), [])
+                    view = render_view(entries)
+                    records.append((
+                        version, year, group, monday.isoformat(), view.entry_count,
+                        gzip.compress(entries_by_day_json(entries).encode('utf-8')),
+                        gzip.compress(view.mobile_html.encode('utf-8')),
+                        gzip.compress(view.desktop_html.encode('utf-8')),
+                    ))
+                monday += timedelta(weeks=1)
+        if not records:
+            return 0
+
+        with conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {ARTIFACTS_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?)", records)
+            conn.execute(f"DELETE FROM {ARTIFACTS_TABLE} WHERE version != ?", (version,))
+        return len(records)
+    finally:
+        conn.close()
+
+
+def load_view(version, year, group_number, monday, db_path=schedule_db.DB_PATH):
+    """Returns the prebuilt ScheduleView for a group of a year and a week, or None if there is none."""
+    try:
+        row = schedule_db.get_connection(db_path).execute(
+            SELECT_VIEW_SQL, (int(version), int(year), str(group_number), monday.isoformat())
+        ).fetchone()
+    except (sqlite3.OperationalError, ValueError, TypeError):
+        return None
+    if row is None:
+        return None
+    return ScheduleView(row[0], gzip.decompress(row[1]).decode('utf-8'), gzip.decompress(row[2]).decode('utf-8'))
+
+
+def render_semester(version, year, group_number, entries, published_at=None):
+    """
+    Renders the printable page with every week of one group: a column per
+    weekday (weekends only when they have classes) and each lesson in the
+    fill colour of its Excel cell.
+    """
+    by_week = {}
+    for entry in entries:
+        by_week.setdefault(week_start(entry.date), {}).setdefault(entry.date.weekday(), []).append(entry)
+    weeks = []
+    for monday, by_weekday in sorted(by_week.items()):
+        weekdays = range(7) if 6 in by_weekday else range(6) if 5 in by_weekday else range(5)
+        weeks.append({
+            "monday": monday,
+            "sunday": monday + timedelta(days=6),
+            "days": [{"name": DAY_NAMES[weekday], "date": monday + timedelta(days=weekday),
+                      "entries": by_weekday.get(weekday, [])} for weekday in weekdays],
+        })
+    return _env.get_template('print/semester.html').render(
+        version=version, year=year, group_number=group_number, weeks=weeks, published_at=published_at,
+        first_date=entries[0].date if entries else None, last_date=entries[-1].date if entries else None,
+    )
+
+
+def build_printables(version, db_path=schedule_db.DB_PATH):
+    """
+    Renders the printable semester page of every group of every year for the
+    published plan version and stores them. Pages of older versions are removed in the same
+    transaction. Returns the number of stored pages (0 if already built).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute(CREATE_PRINT_SQL)
+        if conn.execute(f"SELECT 1 FROM {PRINT_TABLE} WHERE version = ? LIMIT 1", (version,)).fetchone():
+            return 0
+        published_at = conn.execute(schedule_db.SELECT_META_VALUE_SQL, ('published_at',)).fetchone()
+        published_at = published_at[0] if published_at else None
+
+        by_group = {}
+        for entry in schedule_db.fetch_all_entries(conn):
+            by_group.setdefault((entry.year, entry.group_number), []).append(entry)
+        if not by_group:
+            return 0
+        # Wszystkie grupy renderują się w ~0,1 s, więc bez puli procesów (fork z wątku
+        # workera gunicorna mógłby odziedziczyć zajętą blokadę z pamięci podręcznej Jinja)
+        pages = []
+        for (year, group_number), entries in by_group.items():
+            entries.sort(key=lambda e: (e.date, e.start_time_formatted))
+            html = render_semester(version, year, group_number, entries, published_at)
+            pages.append((version, year, group_number, gzip.compress(html.encode('utf-8'))))
+
+        with conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {PRINT_TABLE} VALUES (?, ?, ?, ?)", pages)
+            conn.execute(f"DELETE FROM {PRINT_TABLE} WHERE version != ?", (version,))
+        return len(pages)
+    finally:
+        conn.close()
+
+
+def load_printable(version, year, group_number, db_path=schedule_db.DB_PATH):
+    """
+    Returns (artifact_version, html) of the newest printable page of a group
+    rendered for a plan version up to `version`, or None if there is none.
+    """
+    try:
+        row = schedule_db.get_connection(db_path).execute(
+            SELECT_PRINT_SQL, (int(year), str(group_number), int(version))
+        ).fetchone()
+    except (sqlite3.OperationalError, ValueError, TypeError):
+        return None
+    if row is None:
+        return None
+    return row[0], gzip.decompress(row[1]).decode('utf-8')
@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import date
+
+# Domyślne okno dnia, w którym szukamy wolnych terminów (minuty od północy)
+DAY_START = 8 * 60
+DAY_END = 20 * 60
+MIN_FREE_MINUTES = 30
+
+
+def minute_label(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_minutes(label):
+    """'HH:MM' -> minutes since midnight; raises ValueError for anything else."""
+    hours, minutes = label.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60 and hours * 60 + minutes <= 24 * 60):
+        raise ValueError(label)
+    return hours * 60 + minutes
+
+
+def _is_weekend(ordinal):
+    # date.fromordinal(1) to poniedziałek
+    return (ordinal - 1) % 7 >= 5
+
+
+def _runs(bits):
+    """Yields (start, end) of every run of set bits, lowest first."""
+    while bits:
+        start = (bits & -bits).bit_length() - 1
+        shifted = bits >> start
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        yield start, start + length
+        bits &= ~(((1 << length) - 1) << start)
+
+
+class AvailabilityIndex:
+    """
+    Busy time of every (year, group, date) of one store snapshot.
+
+    Each day of a group is a minute bitset (bit m set = busy during minute m),
+    built once per plan version from the snapshot's start/end columns. The busy
+    time of any set of groups is then a plain OR, free windows are the runs of
+    zero bits and overlaps the bits set in more than one group, so a query over
+    a whole semester touches one integer per group and day.
+    """
+
+    def __init__(self, snapshot):
+        started = time.perf_counter()
+        self.snapshot = snapshot
+        self.masks = {}                # (year, group) -> {ordinal: bitset}
+        self.groups = {}               # year -> [group, ...] w kolejności numerów
+        for key, (lo, hi) in snapshot.index.items():
+            masks = self.masks[key] = {}
+            self.groups.setdefault(key[0], []).append(key[1])
+            for i in range(lo, hi):
+                start, end = snapshot.starts[i], snapshot.ends[i]
+                if end > start:
+                    ordinal = snapshot.dates[i]
+                    masks[ordinal] = masks.get(ordinal, 0) | ((1 << (end - start)) - 1) << start
+        for numbers in self.groups.values():
+            numbers.sort(key=lambda g: (len(g), g))
+        self.build_seconds = time.perf_counter() - started
+
+    def check_groups(self, year, groups):
+        """Raises ValueError naming the groups that have no entries in the year."""
+        unknown = [str(group) for group in groups if (year, str(group)) not in self.masks]
+        if unknown or (not groups and year not in self.groups):
+            raise ValueError(f"Unknown group(s) in year {year}: {', '.join(unknown) or 'all'}.")
+
+    def _keys(self, year, groups):
+        self.check_groups(year, groups)
+        if not groups:
+            return [(year, group) for group in self.groups[year]]
+        return [(year, str(group)) for group in groups]
+
+    def free_windows(self, year, groups, start_date, end_date, day_start=DAY_START, day_end=DAY_END,
+                     min_minutes=MIN_FREE_MINUTES, weekends=False):
+        """
+        Returns [(date, [(start_minute, end_minute), ...]), ...]: the windows of at least
+        `min_minutes` between day_start and day_end in which every given group (all groups
+        of the year when `groups` is empty) is free. Days without any window are left out.
+        """
+        per_group = [self.masks[key] for key in self._keys(year, groups)]
+        window = ((1 << (day_end - day_start)) - 1) << day_start
+        result = []
+        for ordinal in range(start_date.toordinal(), end_date.toordinal() + 1):
+            if not weekends and _is_weekend(ordinal):
+                continue
+            busy = 0
+            for masks in per_group:
+                busy |= masks.get(ordinal, 0)
+            windows = [(start, end) for start, end in _runs(window & ~busy) if end - start >= min_minutes]
+            if windows:
+                result.append((date.fromordinal(ordinal), windows))
+        return result
+
+    def overlaps(self, year, groups, start_date, end_date, min_minutes=1):
+        """
+        Returns [(date, [(start_minute, end_minute, [group, ...]), ...]), ...]: the windows in
+        which at least two of the given groups (all groups of the year when `groups` is empty)
+        have classes at the same time, with the groups busy during each window.
+        """
+        keys = self._keys(year, groups)
+        per_group = [(group, self.masks[(year, group)]) for (_, group) in keys]
+        result = []
+        for ordinal in range(start_date.toordinal(), end_date.toordinal() + 1):
+            # Minuta zajęta przez co najmniej dwie grupy: bit ustawiony i w `seen`, i w kolejnej masce
+            seen = overlap = 0
+            present = []
+            for group, masks in per_group:
+                mask = masks.get(ordinal)
+                if mask:
+                    overlap |= seen & mask
+                    seen |= mask
+                    present.append((group, mask))
+            if not overlap:
+                continue
+            windows = []
+            for start, end in _runs(overlap):
+                if end - start < min_minutes:
+                    continue
+                run = ((1 << (end - start)) - 1) << start
+                windows.append((start, end, [group for group, mask in present if mask & run]))
+            if windows:
+                result.append((date.fromordinal(ordinal), windows))
+        return result
+
+
+class Availability:
+    """Keeps the AvailabilityIndex of the store's current snapshot, rebuilt when the plan version changes."""
+
+    def __init__(self, store):
+        self.store = store
+        self._index = None
+        self._lock = threading.Lock()
+
+    def index(self, version):
+        snapshot = self.store.snapshot(version)
+        index = self._index
+        if index is None or index.snapshot is not snapshot:
+            with self._lock:
+                if self._index is None or self._index.snapshot is not snapshot:
+                    self._index = AvailabilityIndex(snapshot)
+                index = self._index
+        return index
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: free-window and overlap queries of availability.py over
+every group of a year and the whole semester in the database (the heaviest
+query the /api/free and /api/overlaps endpoints accept), plus random
+smaller group sets and ranges.
+
+Runs against a temporary copy of plan.db, so the committed database is
+never modified. Exits with status 1 if the p95 of a full-semester query
+exceeds --budget milliseconds.
+
+    python benchmarks/bench_availability.py [--rounds N] [--budget MS]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import schedule_db  # noqa: E402
+from availability import Availability  # noqa: E402
+from schedule_store import ScheduleStore  # noqa: E402
+
+
+def measure(rounds, func, *args):
+    """Returns per-call durations in milliseconds, sorted."""
+    durations = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func(*args)
+        durations.append((time.perf_counter() - started) * 1000)
+    return sorted(durations)
+
+
+def report(name, durations):
+    p50 = durations[len(durations) // 2]
+    p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+    print(f"{name:40s} p50 {p50:7.3f} ms   p95 {p95:7.3f} ms   max {durations[-1]:7.3f} ms")
+    return p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--budget', type=float, default=10.0, help="p95 limit of a full-semester query (ms)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plan.db')
+        shutil.copy(os.path.join(ROOT, 'plan.db'), db_path)
+        store = ScheduleStore(db_path)
+        snapshot = store.reload()
+
+        started = time.perf_counter()
+        index = Availability(store).index(snapshot.version)
+        print(f"index build {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        year = schedule_db.DEFAULT_YEAR
+        groups = index.groups[year]
+        first = date.fromordinal(min(snapshot.dates))
+        last = date.fromordinal(max(snapshot.dates))
+        print(f"year {year}: {len(groups)} groups, {first} .. {last}")
+
+        worst = max(
+            report("free, all groups, semester", measure(args.rounds, index.free_windows, year, (), first, last)),
+            report("overlaps, all groups, semester", measure(args.rounds, index.overlaps, year, (), first, last)),
+        )
+
+        rng = random.Random(0)
+        days = (last - first).days
+        samples = []
+        for _ in range(args.rounds):
+            start = first + timedelta(days=rng.randrange(days))
+            samples.append((tuple(rng.sample(groups, rng.randint(2, 6))), start, start + timedelta(days=rng.randint(6, 30))))
+
+        for name, query in (('free', index.free_windows), ('overlaps', index.overlaps)):
+            durations = []
+            for selection, start, end in samples:
+                durations.extend(measure(1, query, year, selection, start, end))
+            report(f"{name}, random 2-6 groups, 1-4 weeks", sorted(durations))
+
+    if worst > args.budget:
+        print(f"FAIL: full-semester p95 {worst:.3f} ms exceeds {args.budget} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Parse benchmark for update.load_and_process_data_rok6 on plan_downloaded.xlsx.
+
+Reports the best wall time of the full parse and of its sheet-reading stage
+(the rest is cell-to-entry extraction), the process peak RSS growth over the
+post-import baseline and the peak traced Python memory of one parse.
+
+The parse output itself is checked by tests/test_parse_golden.py.
+
+    python benchmarks/bench_parse.py [--file plan_downloaded.xlsx] [--rounds N]
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def best_of(rounds, func, *args):
+    best, result = None, None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def read_stage(update, file_path):
+    wb = update.load_workbook(file_path, data_only=True, read_only=True)
+    sheet = wb["semestr 11"]
+    update.read_sheet(sheet)
+    update.read_merged_ranges(sheet)
+    wb.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--file', default=os.path.join(ROOT, 'plan_downloaded.xlsx'))
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    import update
+
+    baseline_rss = max_rss_mb()
+    total, entries = best_of(args.rounds, update.load_and_process_data_rok6, args.file)
+    rss_delta = max_rss_mb() - baseline_rss
+    read, _ = best_of(args.rounds, read_stage, update, args.file)
+
+    tracemalloc.start()
+    update.load_and_process_data_rok6(args.file)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"entries:        {len(entries)}")
+    print(f"parse time:     {total * 1000:.1f} ms")
+    print(f"  read sheet:   {read * 1000:.1f} ms")
+    print(f"  extraction:   {(total - read) * 1000:.1f} ms")
+    print(f"peak RSS delta: {rss_delta:.1f} MiB")
+    print(f"traced peak:    {traced_peak / 2**20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
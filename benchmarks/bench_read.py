@@ -0,0 +1,104 @@
+"""
+Micro-benchmark: pd.read_sql (old request path) vs schedule_db.fetch_entries
+vs the in-memory ScheduleStore used by the web tier.
+
+Runs against a temporary copy of plan.db (schema and indexes ensured as at
+publish time), so the committed database is never modified.
+
+Needs SQLAlchemy for the pd.read_sql path (pip install -r requirements-dev.txt).
+
+    python benchmarks/bench_read.py [--rounds N]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import schedule_db  # noqa: E402
+
+
+def sample_queries(db_path, count, seed=0):
+    conn = sqlite3.connect(db_path)
+    groups = [row[0] for row in conn.execute(f"SELECT DISTINCT group_number FROM {schedule_db.TABLE_NAME}")]
+    first, last = conn.execute(f"SELECT MIN(date), MAX(date) FROM {schedule_db.TABLE_NAME}").fetchone()
+    conn.close()
+    first, last = date.fromisoformat(first[:10]), date.fromisoformat(last[:10])
+    mondays = []
+    monday = first - timedelta(days=first.weekday())
+    while monday <= last:
+        mondays.append(monday)
+        monday += timedelta(weeks=1)
+    rng = random.Random(seed)
+    return [(rng.choice(groups), start, start + timedelta(days=6))
+            for start in (rng.choice(mondays) for _ in range(count))]
+
+
+def bench_pandas(db_path, queries):
+    import pandas as pd
+    from sqlalchemy import create_engine
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    rows = 0
+    started = time.perf_counter()
+    for group_number, start, end in queries:
+        query = f"""
+        SELECT * FROM {schedule_db.TABLE_NAME}
+        WHERE date >= '{start}'
+          AND date <= '{end}'
+          AND group_number = '{group_number}'
+        """
+        df = pd.read_sql(query, engine)
+        df['date'] = pd.to_datetime(df['date']).dt.date
+        rows += len(df.to_dict('records'))
+    return time.perf_counter() - started, rows
+
+
+def bench_schedule_db(db_path, queries):
+    rows = 0
+    started = time.perf_counter()
+    for group_number, start, end in queries:
+        rows += len(schedule_db.fetch_entries(group_number, start, end, db_path=db_path))
+    return time.perf_counter() - started, rows
+
+
+def bench_schedule_store(db_path, queries):
+    from schedule_store import ScheduleStore
+
+    store = ScheduleStore(db_path)
+    version = store.reload().version
+    print(f"{'':12s} store: {store.stats()}")
+    rows = 0
+    started = time.perf_counter()
+    for group_number, start, end in queries:
+        rows += len(store.fetch(version, schedule_db.DEFAULT_YEAR, group_number, start, end))
+    return time.perf_counter() - started, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'plan.db')
+        shutil.copy(os.path.join(ROOT, 'plan.db'), db_path)
+        with sqlite3.connect(db_path) as conn:
+            schedule_db.ensure_schema(conn)
+
+        queries = sample_queries(db_path, args.rounds)
+        for name, bench in (('pd.read_sql', bench_pandas), ('schedule_db', bench_schedule_db),
+                            ('store', bench_schedule_store)):
+            elapsed, rows = bench(db_path, queries)
+            print(f"{name:12s} {elapsed * 1e6 / len(queries):9.1f} us/query  ({rows} rows)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Cold-start benchmark of the web process: time to import app.py (what a new
+gunicorn worker does before it can answer), time of the first and second
+request to / and which heavy modules the import pulled in.
+
+Every run is a fresh interpreter working on a temporary copy of the
+repository, once without any compiled Python or Jinja bytecode (first start
+after a deploy without a build step) and once after the build step
+`python -m compileall -q . && flask --app app precompile`.
+
+    python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Moduły, których proces WWW nie powinien ładować przy starcie (potrzebne tylko do /update)
+HEAVY_MODULES = ('pandas', 'numpy', 'sqlalchemy', 'openpyxl', 'bs4', 'requests', 'update')
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/')
+first = time.perf_counter()
+client.get('/')
+second = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (first - imported) * 1000,
+    "second_request_ms": (second - first) * 1000,
+    "heavy_modules": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def copy_tree(destination):
+    ignore = shutil.ignore_patterns('.git', '__pycache__', '.jinja_cache', '*.xlsx', '*.pickle', 'plan.db-*')
+    shutil.copytree(ROOT, destination, ignore=ignore)
+
+
+def probe(workdir):
+    env = dict(os.environ, JINJA_CACHE_DIR=os.path.join(workdir, '.jinja_cache'))
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(name, results):
+    print(f"{name}:")
+    for key in ('import_ms', 'first_request_ms', 'second_request_ms'):
+        values = [result[key] for result in results]
+        print(f"  {key:18s} median {statistics.median(values):7.1f}   min {min(values):7.1f}   max {max(values):7.1f}")
+    heavy = sorted({module for result in results for module in result['heavy_modules']})
+    print(f"  heavy modules imported: {', '.join(heavy) or 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = os.path.join(tmp, 'app')
+        copy_tree(workdir)
+        cache_dir = os.path.join(workdir, '.jinja_cache')
+
+        cold = []
+        for _ in range(args.runs):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            shutil.rmtree(os.path.join(workdir, '__pycache__'), ignore_errors=True)
+            cold.append(probe(workdir))
+        summarize("no build step", cold)
+
+        env = dict(os.environ, JINJA_CACHE_DIR=cache_dir)
+        subprocess.run([sys.executable, '-m', 'compileall', '-q', '.'], cwd=workdir, check=True, env=env)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'precompile'], cwd=workdir, check=True,
+                       env=env, capture_output=True)
+        summarize("after build step", [probe(workdir) for _ in range(args.runs)])
+
+
+if __name__ == '__main__':
+    main()
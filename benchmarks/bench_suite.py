@@ -0,0 +1,610 @@
+"""
+Offline benchmark suite for the update (fetch, parse, publish) and serve paths.
+
+Everything runs in a temporary directory seeded with the committed plan.db and
+plan_downloaded.xlsx; the repository files are never modified.
+
+  fetch    update.main() end to end against a local HTTP stand-in for the
+           university site, plus a conditional re-download answered with 304
+  parse    the stages of parsing the 6th-year sheet: sheet read (values and
+           fill colours), merged ranges, merged-cell fill, grid location,
+           entry extraction
+  publish  publish_entries into an empty database, a no-op re-publish and
+           build_artifacts for the published version
+  serve    an in-process WSGI load generator (N client threads calling the
+           Flask app directly) for / and the API/calendar routes, reporting
+           p50/p95/p99 latency and throughput
+  workers  (not run by default) real gunicorn servers, sync vs gthread as
+           configured in gunicorn.conf.py, under --worker-clients concurrent
+           HTTP clients (a mix of the serve scenarios) while the plan is
+           republished in the background every 0.5 s; --worker-streams keeps
+           that many /api/changes/stream connections open during each run
+
+Every stage records its best wall time over --rounds and its tracemalloc peak.
+Results are written as JSON (default benchmarks/baseline.json). With --compare
+the run is checked against an earlier baseline instead (and only written if
+--output is given); the exit status is 1 if any timing got slower than
+--tolerance allows.
+
+    python benchmarks/bench_suite.py [--rounds N] [--requests N] [--clients N]
+                                     [--stages fetch,parse,publish,serve,workers]
+                                     [--worker-clients 50,100,250,500]
+                                     [--output FILE] [--compare FILE] [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from contextlib import contextmanager
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tests.stub_site import StubSite  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+
+# --- pomiary ----------------------------------------------------------------
+
+def measure(rounds, func, *args):
+    """Runs func `rounds` times; returns (result, stats) with the best time and one traced memory peak."""
+    best = None
+    result = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"seconds": round(best, 6), "traced_peak_mib": round(peak / 2**20, 2)}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+@contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def seed_directory(path):
+    shutil.copy(os.path.join(ROOT, 'plan.db'), os.path.join(path, 'plan.db'))
+    shutil.copy(os.path.join(ROOT, 'plan_downloaded.xlsx'), os.path.join(path, 'plan_downloaded.xlsx'))
+
+
+# --- fetch ------------------------------------------------------------------
+
+def bench_fetch(update, rounds):
+    with open(os.path.join(ROOT, 'plan_downloaded.xlsx'), 'rb') as f:
+        site = StubSite(f.read())
+    saved = update.CHECK_URL, update.DOWNLOAD_BASE_URL
+    update.CHECK_URL, update.DOWNLOAD_BASE_URL = site.base_url + 'listing', site.base_url
+    results = {}
+    try:
+        full = []
+        for _ in range(rounds):
+            with tempfile.TemporaryDirectory() as tmp, working_directory(tmp):
+                # Pusta baza: pełna ścieżka pobierania, parsowania i publikacji
+                report = update.main()
+                full.append(report)
+        best = min(full, key=lambda r: sum(p['seconds'] for p in r.phases))
+        results['update_main'] = {
+            "outcome": best.outcome,
+            "seconds": round(sum(p['seconds'] for p in best.phases), 6),
+            "phases": {p['name']: p['seconds'] for p in best.phases},
+            "rows": best.rows,
+        }
+
+        validators = {'etag': '"%s"' % hashlib.md5(site.xlsx).hexdigest()}
+        url = site.base_url + 'files/VI%20rok.xlsx'
+        _, results['download_200'] = measure(rounds, update.conditional_get, url, {})
+        _, results['download_304'] = measure(rounds, update.conditional_get, url, validators)
+    finally:
+        update.CHECK_URL, update.DOWNLOAD_BASE_URL = saved
+        site.close()
+    return results
+
+
+# --- parse ------------------------------------------------------------------
+
+def bench_parse(update, rounds):
+    file_path = os.path.join(ROOT, 'plan_downloaded.xlsx')
+    results = {}
+
+    def read():
+        wb = update.load_workbook(file_path, data_only=True, read_only=True)
+        sheet = wb["semestr 11"]
+        values, colors = update.read_sheet(sheet)
+        merged = update.read_merged_ranges(sheet)
+        wb.close()
+        return values, colors, merged
+
+    def read_values_only():
+        wb = update.load_workbook(file_path, data_only=True, read_only=True)
+        for _ in wb["semestr 11"].iter_rows(values_only=True):
+            pass
+        wb.close()
+
+    (values, colors, merged), results['read_sheet'] = measure(rounds, read)
+    # Różnica między pełnym odczytem a samymi wartościami to koszt kolorów wypełnienia
+    _, values_only = measure(rounds, read_values_only)
+    results['read_colors'] = {"seconds": round(max(0.0, results['read_sheet']['seconds'] - values_only['seconds']), 6)}
+    lookup, results['merged_lookup'] = measure(rounds, update.build_merged_lookup, merged)
+    (rows, filled_colors), results['fill_merged'] = measure(rounds, update.fill_merged_cells, values, colors, lookup)
+
+    # Te same wartości, które parse_sheet wylicza przed ekstrakcją
+    (group_col, first_group_row, col_to_date_map), results['locate_grid'] = measure(
+        rounds, update.locate_grid, values, update.sheet_layout(6, 'semestr 11'))
+    entries, results['extract_entries'] = measure(
+        rounds, update.extract_entries, rows, filled_colors, group_col, first_group_row, col_to_date_map)
+
+    entries, results['total'] = measure(rounds, update.load_and_process_data_rok6, file_path)
+    results['total']['entries'] = len(entries)
+    return results, entries
+
+
+# --- publish ----------------------------------------------------------------
+
+def bench_publish(entries, rounds):
+    import artifacts
+    import schedule_db
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        def publish_fresh():
+            db_path = os.path.join(tmp, 'fresh.db')
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            return schedule_db.publish_entries(entries, db_path)
+
+        result, results['publish_full'] = measure(rounds, publish_fresh)
+        results['publish_full']['inserted'] = result['inserted']
+
+        db_path = os.path.join(tmp, 'fresh.db')
+        result, results['publish_unchanged'] = measure(rounds, schedule_db.publish_entries, entries, db_path)
+        results['publish_unchanged']['inserted'] = result['inserted']
+
+        def render_artifacts():
+            conn = sqlite3.connect(db_path)
+            with conn:
+                conn.execute(f"DROP TABLE IF EXISTS {artifacts.ARTIFACTS_TABLE}")
+            conn.close()
+            return artifacts.build_artifacts(result['version'], db_path)
+
+        count, results['build_artifacts'] = measure(rounds, render_artifacts)
+        results['build_artifacts']['artifacts'] = count
+    return results
+
+
+# --- serve ------------------------------------------------------------------
+
+def sample_targets(db_path, seed=0):
+    conn = sqlite3.connect(db_path)
+    groups = [row[0] for row in conn.execute("SELECT DISTINCT group_number FROM schedule_entries")]
+    first, last = conn.execute("SELECT MIN(date), MAX(date) FROM schedule_entries").fetchone()
+    conn.close()
+    first, last = date.fromisoformat(first[:10]), date.fromisoformat(last[:10])
+    mondays = []
+    monday = first - timedelta(days=first.weekday())
+    while monday <= last:
+        mondays.append(monday)
+        monday += timedelta(weeks=1)
+    return groups, mondays, random.Random(seed)
+
+
+def build_scenarios(groups, mondays, rng):
+    """Each scenario returns (method, path, headers, form) for one request."""
+    def index():
+        monday = rng.choice(mondays)
+        return 'POST', '/', {}, {
+            'group_number': rng.choice(groups),
+            'start_date': monday.isoformat(),
+            'end_date': (monday + timedelta(days=6)).isoformat(),
+        }
+
+    def api_week():
+        return 'GET', f"/api/schedule?group={rng.choice(groups)}&week={rng.choice(mondays)}", \
+            {'Accept-Encoding': 'gzip'}, None
+
+    def api_range():
+        start = rng.choice(mondays)
+        return 'GET', f"/api/schedule/range?group={rng.choice(groups)}&start={start}&end={start + timedelta(days=27)}", \
+            {'Accept-Encoding': 'gzip'}, None
+
+    def calendar():
+        return 'GET', f"/calendar/{rng.choice(groups)}.ics", {'Accept-Encoding': 'gzip'}, None
+
+    def search():
+        word = rng.choice(('pediatria', 'sem', 'chirurgia', 'wyk', 'interna'))
+        return 'GET', f"/api/search?q={word}&groups={rng.choice(groups)}", {'Accept-Encoding': 'gzip'}, None
+
+    return {'index': index, 'api_schedule': api_week, 'api_schedule_range': api_range, 'calendar': calendar,
+            'api_search': search}
+
+
+def make_environ(method, path, headers, form):
+    from werkzeug.test import EnvironBuilder
+
+    builder = EnvironBuilder(path=path, method=method, headers=headers, data=form)
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def call_wsgi(app, environ):
+    status = []
+
+    def start_response(status_line, response_headers, exc_info=None):
+        status.append(status_line)
+
+    body = app(environ, start_response)
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return status[0]
+
+
+def load_test(app, requests_list, clients):
+    """Replays prepared requests from `clients` threads; returns latency percentiles and throughput."""
+    latencies = []
+    errors = []
+    position = iter(range(len(requests_list)))
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients + 1)
+
+    def client():
+        local = []
+        barrier.wait()
+        while True:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                break
+            environ = make_environ(*requests_list[index])
+            started = time.perf_counter()
+            status = call_wsgi(app, environ)
+            local.append(time.perf_counter() - started)
+            if not status.startswith(('200', '304')):
+                errors.append(status)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "clients": clients,
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def bench_serve(request_count, clients):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, working_directory(tmp):
+        seed_directory(tmp)
+        import artifacts
+        import schedule_db
+        artifacts.build_artifacts(int(schedule_db.read_meta()['version']))
+
+        import app as web
+        groups, mondays, rng = sample_targets('plan.db')
+        scenarios = build_scenarios(groups, mondays, rng)
+
+        for name, scenario in scenarios.items():
+            web.schedule_cache = type(web.schedule_cache)(web.CACHE_SIZE)
+            requests_list = [scenario() for _ in range(request_count)]
+            results[name] = load_test(web.app.wsgi_app, requests_list, clients)
+
+        # Powtórne wizyty z ETagiem – odpowiedź 304 bez odczytu planu
+        method, path, headers, _ = scenarios['api_schedule']()
+        environ = make_environ(method, path, headers, None)
+        etag = None
+
+        def capture(status_line, response_headers, exc_info=None):
+            nonlocal etag
+            etag = dict(response_headers).get('ETag')
+
+        list(web.app.wsgi_app(environ, capture))
+        revalidations = [(method, path, dict(headers, **{'If-None-Match': etag}), None)] * request_count
+        results['api_schedule_304'] = load_test(web.app.wsgi_app, revalidations, clients)
+        results['schedule_cache'] = web.schedule_cache.stats()
+    return results
+
+
+# --- workers ----------------------------------------------------------------
+
+WORKER_MODES = {
+    # Dawny Procfile: `gunicorn app:app`, czyli jeden worker sync (threads > 1 zamieniłoby go w gthread)
+    'sync': ['--worker-class', 'sync', '--workers', '1', '--threads', '1'],
+    'gthread': [],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def raw_request(method, path, headers, form):
+    body = urlencode(form).encode('utf-8') if form else b''
+    lines = [f"{method} {path} HTTP/1.1", "Host: 127.0.0.1", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    if form:
+        lines += ["Content-Type: application/x-www-form-urlencoded", f"Content-Length: {len(body)}"]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def http_load(port, requests_list, clients, timeout=30):
+    """Sends prepared raw requests over `clients` concurrent connections (one per request)."""
+    queue = iter(requests_list)
+    latencies = []
+    errors = []
+
+    async def one(data):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            writer.write(data)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        return response[9:12].decode('latin-1')
+
+    async def client():
+        for data in queue:
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(one(data), timeout)
+            except (OSError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            if status not in ('200', '304'):
+                errors.append(status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "clients": clients,
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def start_gunicorn(tmp, port, extra_args):
+    env = dict(os.environ, PYTHONPATH=ROOT, JINJA_CACHE_DIR=os.path.join(tmp, '.jinja_cache'))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), '--chdir', tmp,
+         '--bind', f'127.0.0.1:{port}', '--backlog', '2048', *extra_args, 'app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def republish_loop(db_path, stop, counter):
+    """Alternates between the full plan and the plan without one entry, like repeated updates."""
+    import schedule_db
+    conn = sqlite3.connect(db_path)
+    entries = [entry.to_dict() for entry in schedule_db.fetch_all_entries(conn)]
+    conn.close()
+    variants = (entries, entries[1:])
+    while not stop.wait(0.5):
+        schedule_db.publish_entries(variants[counter[0] % 2], db_path)
+        counter[0] += 1
+
+
+def open_streams(port, count):
+    streams = []
+    for _ in range(count):
+        stream = socket.create_connection(('127.0.0.1', port))
+        stream.sendall(raw_request('GET', '/api/changes/stream?group=1', {}, None))
+        streams.append(stream)
+    time.sleep(0.5)
+    return streams
+
+
+def bench_workers(request_count, client_levels, streams=0, timeout=30):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_directory(tmp)
+        db_path = os.path.join(tmp, 'plan.db')
+        groups, mondays, rng = sample_targets(db_path)
+        scenarios = list(build_scenarios(groups, mondays, rng).values())
+        requests_list = [raw_request(*scenarios[i % len(scenarios)]()) for i in range(request_count)]
+
+        for mode, extra_args in WORKER_MODES.items():
+            port = free_port()
+            server = start_gunicorn(tmp, port, extra_args)
+            try:
+                asyncio.run(http_load(port, requests_list[:100], 10))  # rozgrzewka
+                results[mode] = {}
+                for clients in client_levels:
+                    stop, counter = threading.Event(), [0]
+                    writer = threading.Thread(target=republish_loop, args=(db_path, stop, counter))
+                    writer.start()
+                    open_connections = open_streams(port, streams)
+                    try:
+                        result = asyncio.run(http_load(port, requests_list, clients, timeout))
+                    finally:
+                        for stream in open_connections:
+                            stream.close()
+                        stop.set()
+                        writer.join()
+                    result["plan_publishes"] = counter[0]
+                    result["open_streams"] = streams
+                    results[mode][f"clients_{clients}"] = result
+            finally:
+                server.terminate()
+                server.wait()
+    return results
+
+
+# --- baseline ---------------------------------------------------------------
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def timings(results, prefix=''):
+    """Flattens the results to {dotted.name: value} for every timing that should not grow."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(timings(value, name + '.'))
+        elif key in ('seconds', 'p50_ms', 'p95_ms', 'p99_ms') and isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, tolerance):
+    """Returns the timings that are slower than baseline by more than `tolerance`."""
+    old = timings(baseline.get('results', {}))
+    regressions = []
+    for name, value in sorted(timings(current).items()):
+        before = old.get(name)
+        if before and value > before * (1 + tolerance):
+            regressions.append(f"{name}: {before} -> {value} (+{(value / before - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=2000, help="requests per serve scenario")
+    parser.add_argument('--clients', type=int, default=8, help="concurrent client threads")
+    parser.add_argument('--stages', default='fetch,parse,publish,serve')
+    parser.add_argument('--worker-clients', default='50,100,250,500',
+                        help="concurrent HTTP clients per run of the workers stage")
+    parser.add_argument('--worker-streams', type=int, default=0,
+                        help="event streams held open during each workers run")
+    parser.add_argument('--worker-timeout', type=float, default=30, help="per-request timeout of the workers stage")
+    parser.add_argument('--output', help=f"where to write the results (default: {os.path.relpath(DEFAULT_OUTPUT, ROOT)})")
+    parser.add_argument('--compare', help="baseline JSON to check this run against")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    output = args.output or (None if args.compare else DEFAULT_OUTPUT)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    warnings.simplefilter('ignore')
+    stages = set(args.stages.split(','))
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()  # update.py drukuje komunikaty postępu
+    try:
+        import update
+        results = {}
+        if 'fetch' in stages:
+            results['fetch'] = bench_fetch(update, args.rounds)
+        if 'parse' in stages or 'publish' in stages:
+            parsed, entries = bench_parse(update, args.rounds)
+            if 'parse' in stages:
+                results['parse'] = parsed
+            if 'publish' in stages:
+                results['publish'] = bench_publish(entries, args.rounds)
+        if 'serve' in stages:
+            results['serve'] = bench_serve(args.requests, args.clients)
+        if 'workers' in stages:
+            client_levels = [int(value) for value in args.worker_clients.split(',')]
+            results['workers'] = bench_workers(args.requests, client_levels, args.worker_streams,
+                                               args.worker_timeout)
+    finally:
+        sys.stdout = stdout
+
+    report = {
+        "environment": environment(),
+        "settings": {"rounds": args.rounds, "requests": args.requests, "clients": args.clients},
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import os
+
+# Wątki zamiast samych procesów: żądanie czekające na SQLite, strumień /api/changes/stream
+# albo wolny klient nie blokuje całego workera. Każdy wątek ma własne połączenie
+# tylko do odczytu (schedule_db.get_connection), a WAL pozwala czytać w trakcie publikacji.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+# Strumienie zmian mają osobny limit (CHANGES_MAX_STREAMS w app.py, domyślnie 2), żeby
+# pozostałe wątki zawsze obsługiwały zwykłe żądania; przy zmianie `threads` dostosuj oba
+
+# Zadania /update i ich stan (/update/<id>) żyją w pamięci procesu, więc domyślnie jeden
+# worker; więcej procesów (WEB_CONCURRENCY) ma sens tylko z osobnym schedulerem
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Połączenia keep-alive obsługuje tylko gthread; przy sync gunicorn je ignoruje
+keepalive = 5
+timeout = 60
+graceful_timeout = 30
@@ -0,0 +1,87 @@
+import gzip
+import hashlib
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # brotli jest opcjonalny – bez niego API kompresuje tylko gzipem
+    brotli = None
+
+# Krótsze odpowiedzi nie zyskują na kompresji
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Pliki statyczne z odciskiem treści w adresie można trzymać w cache bez końca
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_fingerprints = {}
+
+
+def make_etag(*parts):
+    """Returns a strong entity tag (unquoted) derived from the given parts."""
+    return hashlib.sha1('|'.join(map(str, parts)).encode('utf-8')).hexdigest()[:24]
+
+
+def asset_fingerprint(path):
+    """
+    Returns a short content hash of a static file, or None if it does not exist.
+    Recomputed only when the file's size or mtime changes.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    fingerprint = _fingerprints.get(key)
+    if fingerprint is None:
+        with open(path, 'rb') as f:
+            fingerprint = _fingerprints[key] = hashlib.sha1(f.read()).hexdigest()[:12]
+    return fingerprint
+
+
+def variant_etag(etag, encoding):
+    """Each content-coding of a resource gets its own strong tag."""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def choose_encoding(accept_encodings):
+    """Picks 'br' or 'gzip' from the request's Accept-Encoding, or None for identity."""
+    if brotli is not None and accept_encodings.quality('br') > 0:
+        return 'br'
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def matches(if_none_match, etag):
+    """
+    True if If-None-Match names any encoding variant of etag (or is '*'). Uses the
+    weak comparison RFC 9110 prescribes for If-None-Match: proxies that re-compress
+    a response send the tag back as W/"...".
+    """
+    return any(if_none_match.contains_weak(variant_etag(etag, encoding)) for encoding in (None, 'gzip', 'br'))
+
+
+class EncodedBody:
+    """A response body whose compressed variants are created on first use and then reused."""
+
+    def __init__(self, data):
+        self.data = data
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def get(self, encoding):
+        """Returns (encoding, bytes); encoding is None if the body is sent uncompressed."""
+        if encoding is None or len(self.data) < MIN_COMPRESS_SIZE:
+            return None, self.data
+        with self._lock:
+            body = self._variants.get(encoding)
+            if body is None:
+                if encoding == 'br':
+                    body = brotli.compress(self.data, quality=BROTLI_QUALITY)
+                else:
+                    body = gzip.compress(self.data, compresslevel=GZIP_LEVEL, mtime=0)
+                self._variants[encoding] = body
+        return encoding, body
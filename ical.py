@@ -0,0 +1,122 @@
+import hashlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+PRODID = '-//plan-zajec//Plan zajec UR//PL'
+TIMEZONE = 'Europe/Warsaw'
+UID_DOMAIN = 'plan-zajec'
+
+# Definicja strefy czasowej wymagana przez RFC 5545 dla DTSTART;TZID=...
+VTIMEZONE = (
+    'BEGIN:VTIMEZONE',
+    f'TZID:{TIMEZONE}',
+    'BEGIN:DAYLIGHT',
+    'TZOFFSETFROM:+0100',
+    'TZOFFSETTO:+0200',
+    'TZNAME:CEST',
+    'DTSTART:19700329T020000',
+    'RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU',
+    'END:DAYLIGHT',
+    'BEGIN:STANDARD',
+    'TZOFFSETFROM:+0200',
+    'TZOFFSETTO:+0100',
+    'TZNAME:CET',
+    'DTSTART:19701025T030000',
+    'RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU',
+    'END:STANDARD',
+    'END:VTIMEZONE',
+)
+
+
+def escape_text(value):
+    """Escapes a TEXT property value (RFC 5545, 3.3.11)."""
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold_line(line):
+    """Folds a content line to at most 75 octets, without splitting UTF-8 sequences."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74  # kolejne linie zaczynają się od spacji
+    return '\r\n '.join(parts)
+
+
+def local_datetime(day, time_label):
+    """Combines an entry date with an 'HH:MM' label; 24:00 and later roll over to the next day."""
+    hours, minutes = (int(part) for part in time_label.split(':'))
+    return datetime(day.year, day.month, day.day) + timedelta(hours=hours, minutes=minutes)
+
+
+def format_local(moment):
+    return moment.strftime('%Y%m%dT%H%M%S')
+
+
+def event_uid(entry, occurrence):
+    """
+    UID of a lesson from what identifies it: year, group, date, start time and subject,
+    plus its occurrence among identical lessons. Unlike the stored entry hash it does
+    not depend on the lesson's position in the day, so other lessons of the day can
+    be added, removed or moved without changing it.
+    """
+    key = (entry.year, entry.group_number, entry.date.isoformat(), entry.start_time_formatted, entry.subject,
+           occurrence)
+    return f"{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:24]}@{UID_DOMAIN}"
+
+
+def build_calendar(group_number, entries, published_at=None, year=None):
+    """
+    Builds an iCalendar feed for one group (of `year`, if given) from its ScheduleEntry
+    objects, in date order.
+
+    The UID of every event comes from event_uid, so an unchanged lesson keeps its UID
+    across plan versions and calendar clients update rather than duplicate it.
+    Returns the feed as UTF-8 bytes with CRLF line endings.
+    """
+    try:
+        stamp = datetime.fromisoformat(published_at).astimezone(timezone.utc)
+    except (TypeError, ValueError):
+        stamp = datetime.now(timezone.utc)
+    dtstamp = stamp.strftime('%Y%m%dT%H%M%SZ')
+    group_label = f"rok {year}, grupa {group_number}" if year else f"grupa {group_number}"
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(f"Plan zajęć – {group_label}")}',
+        f'X-WR-TIMEZONE:{TIMEZONE}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT12H',
+        'X-PUBLISHED-TTL:PT12H',
+        *VTIMEZONE,
+    ]
+    occurrences = Counter()
+    for entry in entries:
+        identity = (entry.date, entry.start_time_formatted, entry.subject)
+        occurrence = occurrences[identity]
+        occurrences[identity] += 1
+        start = local_datetime(entry.date, entry.start_time_formatted)
+        end = local_datetime(entry.date, entry.end_time_formatted)
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:{event_uid(entry, occurrence)}',
+            f'DTSTAMP:{dtstamp}',
+            f'DTSTART;TZID={TIMEZONE}:{format_local(start)}',
+            f'DTEND;TZID={TIMEZONE}:{format_local(max(end, start))}',
+            f'SUMMARY:{escape_text(entry.subject)}',
+            f'DESCRIPTION:{escape_text(f"{group_label.capitalize()}, {entry.day.lower()}")}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(fold_line(line) for line in lines) + '\r\n').encode('utf-8')
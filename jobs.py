@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class UpdateReport:
+    """Collects the outcome, phase timings and row counts of one update run."""
+
+    def __init__(self):
+        self.outcome = None
+        self.message = None
+        self.plan_version = None
+        self.phases = []
+        self.rows = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({"name": name, "seconds": round(time.perf_counter() - started, 3)})
+
+    def finish(self, outcome, message):
+        """Records how the run ended ('updated', 'unchanged', 'skipped' or 'error') and prints the message."""
+        print(message)
+        self.outcome = outcome
+        self.message = message
+        return self
+
+    def to_dict(self):
+        return {
+            "outcome": self.outcome,
+            "message": self.message,
+            "plan_version": self.plan_version,
+            "phases": self.phases,
+            "rows": self.rows,
+        }
+
+
+class UpdateJob:
+    """One queued or executed update, as reported by the /update/<id> endpoint."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.state = "queued"
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.report = UpdateReport()
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def to_dict(self):
+        def iso(value):
+            return value.isoformat(timespec="seconds") if value else None
+
+        return {
+            "id": self.id,
+            "state": self.state,
+            "created_at": iso(self.created_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+            "error": self.error,
+            **self.report.to_dict(),
+        }
+
+
+class UpdateRunner:
+    """
+    Runs updates on a single background thread of the web process.
+
+    The thread imports the update stack on its first job and stays warm for the
+    next ones. While a job is queued or running, further triggers get that same
+    job back instead of starting another parser.
+    """
+
+    def __init__(self, target, history=20):
+        self._target = target
+        self._history = history
+        self._jobs = OrderedDict()
+        self._current = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self):
+        """Returns (job, created): the active job if there is one, otherwise a newly queued job."""
+        with self._lock:
+            if self._current is not None and self._current.active:
+                return self._current, False
+            job = UpdateJob()
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._history:
+                self._jobs.popitem(last=False)
+            self._current = job
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name="update-runner", daemon=True)
+                self._thread.start()
+            self._queue.put(job)
+            return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.state = "running"
+            job.started_at = datetime.now()
+            try:
+                self._target(job.report)
+                job.state = "failed" if job.report.outcome == "error" else "finished"
+            except Exception as e:
+                job.error = str(e)
+                job.state = "failed"
+                traceback.print_exc()
+            finally:
+                job.finished_at = datetime.now()
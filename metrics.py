@@ -0,0 +1,142 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Granice kubełków w sekundach: od pojedynczych zapytań do całego parsowania
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in items]
+
+
+class Gauge:
+    """Value read at scrape time from a callback; a None result omits the sample."""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        _registry.append(self)
+
+    def samples(self):
+        value = self.callback()
+        return [] if value is None else [(self.name, '', value)]
+
+
+class CallbackCounter(Gauge):
+    """Counter maintained elsewhere (e.g. ScheduleCache.hits) and read at scrape time."""
+    type = 'counter'
+
+
+class Histogram:
+    """Cumulative histogram with fixed bucket bounds, optionally split by labels."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        # Zapamiętywany jest tylko kubełek wartości; sumy skumulowane liczy dopiero eksport
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        samples = []
+        for labels, buckets, total, count in items:
+            cumulative = 0
+            for bound, bucket in zip(self.bounds + (float('inf'),), buckets):
+                cumulative += bucket
+                samples.append((f'{self.name}_bucket',
+                                _format_labels(self.labelnames, labels, (('le', _format_value(bound)),)),
+                                cumulative))
+            samples.append((f'{self.name}_sum', _format_labels(self.labelnames, labels), total))
+            samples.append((f'{self.name}_count', _format_labels(self.labelnames, labels), count))
+        return samples
+
+
+def render():
+    """Returns all registered metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{labels} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', "Time spent handling a request, by route.", ('route', 'method'))
+REQUESTS = Counter(
+    'http_requests_total', "Handled requests, by route and status code.", ('route', 'method', 'status'))
+STAGE_SECONDS = Histogram(
+    'http_stage_duration_seconds', "Time spent in one stage of a request (query, transform, render).", ('stage',))
+DB_SECONDS = Histogram(
+    'db_query_duration_seconds', "Time spent reading the schedule (database or in-memory store), by query.",
+    ('query',))
+UPDATE_PHASE_SECONDS = Histogram(
+    'update_phase_duration_seconds', "Duration of each phase of an update run (fetch, parse, publish, render).",
+    ('phase',))
+UPDATE_RUNS = Counter('update_runs_total', "Finished update runs, by outcome.", ('outcome',))
+ROWS_PARSED = Counter('update_rows_parsed_total', "Schedule entries parsed by update runs.")
@@ -0,0 +1,61 @@
+import os
+import pickle
+import tempfile
+
+
+class ParseCache:
+    """
+    On-disk cache of parsed schedule sheets, kept as a pickle next to plan.db.
+
+    For every (year, sheet) it holds the fingerprint of the workbook parts the
+    sheet was read from, the entries extracted from it, and the entries of
+    every date block (the columns of one day) with a fingerprint of the block's
+    cells. update.py reuses a whole sheet when its parts are unchanged, and
+    otherwise re-extracts only the date blocks whose cells changed.
+
+    `version` identifies the parser; a cache written by another version is ignored.
+    """
+
+    def __init__(self, path, version, sheets=None):
+        self.path = path
+        self.version = version
+        self.sheets = sheets or {}
+        self.stats = {'sheets_reused': 0, 'sheets_parsed': 0, 'blocks_reused': 0, 'blocks_parsed': 0}
+
+    @classmethod
+    def load(cls, path, version):
+        """Reads the cache from path; a missing, unreadable or outdated file gives an empty cache."""
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return cls(path, version)
+        except Exception as e:
+            print(f"Ignoring unreadable parse cache {path}: {e}")
+            return cls(path, version)
+        if not isinstance(data, dict) or data.get('version') != version:
+            return cls(path, version)
+        return cls(path, version, data.get('sheets'))
+
+    def get(self, year, sheet_name):
+        return self.sheets.get((year, sheet_name))
+
+    def put(self, year, sheet_name, state):
+        self.sheets[(year, sheet_name)] = state
+
+    def retain(self, year, sheet_names):
+        """Drops cached sheets of `year` that are no longer in its workbook."""
+        for key in [key for key in self.sheets if key[0] == year and key[1] not in sheet_names]:
+            del self.sheets[key]
+
+    def save(self):
+        """Writes the cache atomically, so a crash never leaves a truncated file behind."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.parse_cache', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({'version': self.version, 'sheets': self.sheets}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
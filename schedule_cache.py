@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+
+
+class ScheduleCache:
+    """
+    Process-local LRU cache for ready-to-render schedule entries.
+
+    Every lookup carries the current plan version (written by update.py together
+    with the schedule table). When the version changes, the whole cache is dropped,
+    so stale weeks are never served after a new plan has been published.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._data.clear()
+            self._version = version
+
+    def get(self, version, key):
+        """Returns the cached value for key or None on a miss."""
+        with self._lock:
+            self._check_version(version)
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, version, key, value):
+        """Stores value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._check_version(version)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._version,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
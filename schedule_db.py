@@ -0,0 +1,600 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+DB_PATH = 'plan.db'
+TABLE_NAME = 'schedule_entries'
+META_TABLE = 'plan_meta'
+LOCK_TABLE = 'plan_locks'
+SEARCH_TABLE = 'schedule_search'
+CHANGES_TABLE = 'plan_changes'
+# Ile ostatnich wersji planu zachowuje historia zmian
+CHANGES_KEEP_VERSIONS = 100
+
+# Rok studiów pokazywany, gdy zapytanie go nie określa (jedyny obsługiwany przed podziałem na lata)
+DEFAULT_YEAR = 6
+# Wiersze zapisane przed dodaniem kolumn year/semester pochodzą z arkusza 'semestr 11' roku 6
+LEGACY_SEMESTER = 11
+
+# Liczby, które mogą być godzinami, z opcjonalną częścią minutową (np. '8', '8.00', '13:15')
+TIME_PATTERN = re.compile(r'\b(\d{1,2}(?:[.:]\d{2})?)\b')
+
+COLUMNS = (
+    'date', 'day', 'group_number', 'subject', 'start_time_formatted',
+    'end_time_formatted', 'duration', 'spacing_before', 'background_color',
+    'year', 'semester',
+)
+
+# year/semester: rok studiów i semestr z nazwy arkusza ('semestr 11'); numery grup
+# powtarzają się w różnych latach, więc grupę identyfikuje para (year, group_number).
+# seq: kolejność zajęć grupy w danym dniu, w jakiej update.py je odczytał
+# (spacing_before liczony jest względem poprzednich zajęć w tej kolejności).
+# entry_hash: skrót treści wiersza, po którym publikacja wylicza różnice.
+CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+    date DATE,
+    day TEXT,
+    group_number TEXT,
+    subject TEXT,
+    start_time_formatted TEXT,
+    end_time_formatted TEXT,
+    duration BIGINT,
+    spacing_before BIGINT,
+    background_color TEXT,
+    year INTEGER,
+    semester INTEGER,
+    seq INTEGER,
+    entry_hash TEXT
+)
+"""
+
+CREATE_META_SQL = f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)"
+
+# Indeks pełnotekstowy przedmiotów: rowid = rowid wiersza w schedule_entries, tekst już znormalizowany.
+# VACUUM może zmienić rowid-y tabeli bez INTEGER PRIMARY KEY, więc po nim indeks trzeba przebudować.
+CREATE_SEARCH_SQL = f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(subject, detail=none)"
+
+SEARCH_SQL = (
+    f"SELECT {', '.join(f'e.{column}' for column in COLUMNS)} "
+    f"FROM {SEARCH_TABLE} s JOIN {TABLE_NAME} e ON e.rowid = s.rowid "
+    f"WHERE {SEARCH_TABLE} MATCH ? AND e.year = ?"
+)
+
+# Zmiany jednej grupy w jednej wersji planu (JSON: added, removed, moved, weeks)
+CREATE_CHANGES_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} "
+    "(version INTEGER, year INTEGER, group_number TEXT, published_at TEXT, changes TEXT, "
+    "PRIMARY KEY (version, year, group_number))"
+)
+
+SELECT_CHANGES_SQL = (
+    f"SELECT version, published_at, changes FROM {CHANGES_TABLE} "
+    "WHERE year = ? AND group_number = ? AND version > ? ORDER BY version"
+)
+
+CREATE_LOCK_SQL = (
+    f"CREATE TABLE IF NOT EXISTS {LOCK_TABLE} "
+    "(name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)"
+)
+
+CREATE_INDEX_SQLS = (
+    f"CREATE INDEX IF NOT EXISTS ix_{TABLE_NAME}_year_group_date "
+    f"ON {TABLE_NAME} (year, group_number, date, seq)",
+    f"CREATE INDEX IF NOT EXISTS ix_{TABLE_NAME}_year_semester "
+    f"ON {TABLE_NAME} (year, semester)",
+)
+
+# Indeks sprzed podziału na lata, zastąpiony przez ix_..._year_group_date
+LEGACY_INDEXES = (f"ix_{TABLE_NAME}_group_date",)
+
+INSERT_SQL = (
+    f"INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)}, seq, entry_hash) "
+    f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})"
+)
+
+SELECT_RANGE_SQL = (
+    f"SELECT {', '.join(COLUMNS)} FROM {TABLE_NAME} "
+    "WHERE year = ? AND group_number = ? AND date >= ? AND date <= ? "
+    "ORDER BY date, seq"
+)
+
+# Wiersz bez roku (tabela sprzed kolumny year, zob. assign_legacy_year) należy do DEFAULT_YEAR
+SELECT_ALL_SQL = (
+    f"SELECT {', '.join(f'COALESCE(year, {DEFAULT_YEAR})' if column == 'year' else column for column in COLUMNS)} "
+    f"FROM {TABLE_NAME} ORDER BY COALESCE(year, {DEFAULT_YEAR}), group_number, date, seq"
+)
+
+SELECT_GROUP_SQL = (
+    f"SELECT {', '.join(COLUMNS)} FROM {TABLE_NAME} "
+    "WHERE year = ? AND group_number = ? ORDER BY date, seq"
+)
+
+SELECT_GROUPS_SQL = f"SELECT DISTINCT year, group_number FROM {TABLE_NAME}"
+
+SELECT_META_VALUE_SQL = f"SELECT value FROM {META_TABLE} WHERE key = ?"
+
+SET_META_SQL = (
+    f"INSERT INTO {META_TABLE} (key, value) VALUES (?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleEntry:
+    date: date
+    day: str
+    group_number: str
+    subject: str
+    start_time_formatted: str
+    end_time_formatted: str
+    duration: int
+    spacing_before: int
+    background_color: str
+    year: int
+    semester: int
+
+    def to_dict(self):
+        """Returns the entry as a JSON-serializable record keyed by column name."""
+        record = {column: getattr(self, column) for column in COLUMNS}
+        record['date'] = self.date.isoformat()
+        return record
+
+
+# Tylko do odczytu; krótkie oczekiwanie, gdyby czytelnik trafił na odtwarzanie WAL po awarii pisarza
+READ_TIMEOUT = 5
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = {}                     # (pid, thread ident, db_path) -> connection
+
+
+def get_connection(db_path=DB_PATH):
+    """
+    Returns this thread's read-only connection to db_path, opening it on first use.
+    sqlite3 keeps prepared statements per connection, so reusing it skips re-parsing SQL.
+
+    Each thread of each process gets its own connection (WAL lets them all read while
+    update.py writes). Opening one also closes the connections of threads that have
+    since exited, so a pool of worker threads keeps exactly one connection per thread;
+    connections inherited from a parent process over fork() are never reused.
+    """
+    pool = getattr(_local, 'connections', None)
+    if pool is None or _local.pid != os.getpid():
+        pool = _local.connections = {}
+        _local.pid = os.getpid()
+    conn = pool.get(db_path)
+    if conn is None:
+        # check_same_thread=False tylko po to, by zamknąć połączenie wątku, który już nie żyje
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, cached_statements=32,
+                               timeout=READ_TIMEOUT, check_same_thread=False)
+        pool[db_path] = conn
+        _register_connection(db_path, conn)
+    return conn
+
+
+def _register_connection(db_path, conn):
+    pid = os.getpid()
+    alive = {thread.ident for thread in threading.enumerate()}
+    with _pool_lock:
+        for key in list(_pool):
+            if key[0] != pid:
+                del _pool[key]             # odziedziczone po fork() – należą do rodzica
+            elif key[1] not in alive:
+                _pool.pop(key).close()
+        # Identyfikator zmarłego wątku może dostać nowy wątek; stare połączenie jest wtedy osierocone
+        previous = _pool.get((pid, threading.get_ident(), db_path))
+        if previous is not None:
+            previous.close()
+        _pool[(pid, threading.get_ident(), db_path)] = conn
+
+
+def connection_count():
+    """Number of read-only connections currently open in this process."""
+    with _pool_lock:
+        return sum(1 for key in _pool if key[0] == os.getpid())
+
+
+def get_meta_value(key, db_path=DB_PATH):
+    """Reads one plan_meta value over the read-only connection (None if missing)."""
+    try:
+        row = get_connection(db_path).execute(SELECT_META_VALUE_SQL, (key,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def get_plan_version(db_path=DB_PATH):
+    """Reads the plan version marker written by update.py (None if not published yet)."""
+    return get_meta_value('version', db_path)
+
+
+def fetch_entries(group_number, start_date, end_date, db_path=DB_PATH, year=DEFAULT_YEAR):
+    """Returns ScheduleEntry objects for one group of a year between start_date and end_date (inclusive)."""
+    try:
+        rows = get_connection(db_path).execute(
+            SELECT_RANGE_SQL, (int(year), str(group_number), start_date.isoformat(), end_date.isoformat())
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [row_to_entry(row) for row in rows]
+
+
+def fetch_group_entries(group_number, db_path=DB_PATH, year=DEFAULT_YEAR):
+    """Returns every stored entry of one group of a year as ScheduleEntry objects, in order."""
+    try:
+        rows = get_connection(db_path).execute(SELECT_GROUP_SQL, (int(year), str(group_number))).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [row_to_entry(row) for row in rows]
+
+
+def fetch_groups(db_path=DB_PATH):
+    """Returns {year: [group numbers]} for every published year, groups in numeric order."""
+    try:
+        rows = get_connection(db_path).execute(SELECT_GROUPS_SQL).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    groups = {}
+    for year, group_number in rows:
+        groups.setdefault(year, []).append(group_number)
+    return {year: sorted(numbers, key=lambda g: (len(g), g)) for year, numbers in sorted(groups.items())}
+
+
+def fetch_all_entries(conn):
+    """Returns every stored entry, ordered by group, date and position within the day."""
+    return [row_to_entry(row) for row in conn.execute(SELECT_ALL_SQL)]
+
+
+# Litery, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+_FOLD_EXTRA = str.maketrans({'ł': 'l', 'ø': 'o', 'đ': 'd', 'ß': 'ss'})
+_WORD = re.compile(r'\w+')
+
+
+def fold_text(text):
+    """Case- and diacritic-insensitive form used by the search index ('Łódź' -> 'lodz')."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold().translate(_FOLD_EXTRA))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def search_entries(query, year=DEFAULT_YEAR, groups=(), start_date=None, end_date=None, limit=200, db_path=DB_PATH):
+    """
+    Returns up to `limit` entries of a year whose subject contains every word of
+    `query` as a word prefix ('pediatria sem' finds 'Pediatria - seminarium'),
+    optionally only for the given groups and dates, ordered by date and group.
+    Raises sqlite3.OperationalError if the search index was not built yet.
+    """
+    words = _WORD.findall(fold_text(query))
+    if not words:
+        return []
+    # Każde słowo w cudzysłowie: znaki składni FTS5 z zapytania nie mają znaczenia
+    sql = [SEARCH_SQL]
+    params = [' '.join(f'"{word}"*' for word in words), int(year)]
+    if groups:
+        sql.append(f"AND e.group_number IN ({', '.join('?' * len(groups))})")
+        params.extend(str(group) for group in groups)
+    if start_date is not None:
+        sql.append("AND e.date >= ?")
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        sql.append("AND e.date <= ?")
+        params.append(end_date.isoformat())
+    sql.append("ORDER BY e.date, e.start_time_formatted, length(e.group_number), e.group_number, e.seq LIMIT ?")
+    params.append(int(limit))
+    rows = get_connection(db_path).execute(' '.join(sql), params).fetchall()
+    return [row_to_entry(row) for row in rows]
+
+
+def rebuild_search_index(conn):
+    """Refills the search table from schedule_entries; runs inside the publish transaction."""
+    conn.create_function('fold_text', 1, fold_text, deterministic=True)
+    conn.execute(CREATE_SEARCH_SQL)
+    conn.execute(f"DELETE FROM {SEARCH_TABLE}")
+    conn.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, subject) SELECT rowid, fold_text(subject) FROM {TABLE_NAME}")
+
+
+def fetch_changes(group_number, since, db_path=DB_PATH, year=DEFAULT_YEAR):
+    """
+    Returns [(version, published_at, changes), ...] for the plan versions after `since`
+    that changed the group; versions that left the group untouched are not listed.
+    """
+    try:
+        rows = get_connection(db_path).execute(SELECT_CHANGES_SQL, (int(year), str(group_number), int(since))).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [(version, published_at, json.loads(changes)) for version, published_at, changes in rows]
+
+
+def diff_group_rows(removed, added):
+    """
+    Compares the rows of one group that left the table with the rows that replaced
+    them (COLUMNS value tuples). Rows equal on both sides apart from spacing_before
+    (only their position in the day changed) cancel out; a removed and an added lesson with the same subject
+    apart from the times written in it count as moved, pairing each removed lesson with the closest added one. Returns
+    {'added': [...], 'removed': [...], 'moved': [{'from': ..., 'to': ...}], 'weeks': [...]}
+    or None if nothing really changed.
+    """
+    def content(values):
+        # spacing_before zmienia się, gdy inne zajęcia tego dnia się przesuną; sama lekcja nie
+        return values[:7] + values[8:]
+
+    unchanged = Counter(map(content, removed)) & Counter(map(content, added))
+    remaining = []
+    for rows in (removed, added):
+        cancel = Counter(unchanged)
+        kept = []
+        for values in sorted(rows):
+            if cancel[content(values)]:
+                cancel[content(values)] -= 1
+            else:
+                kept.append(values)
+        remaining.append(kept)
+    removed, added = remaining
+    if not removed and not added:
+        return None
+
+    def moment(values):
+        return (values[0][:10], values[4])
+
+    def topic(values):
+        # Opis zajęć zawiera ich godziny ('8.00-9.30', 'od 8.00 do 13.15'), które przy przesunięciu się zmieniają
+        return ' '.join(TIME_PATTERN.sub(' ', values[3]).split())
+
+    moved = []
+    unmatched = []
+    for old in removed:
+        candidates = [values for values in added if topic(values) == topic(old)]
+        if not candidates:
+            unmatched.append(old)
+            continue
+        new = min(candidates, key=lambda values: (abs(date.fromisoformat(values[0][:10]).toordinal()
+                                                      - date.fromisoformat(old[0][:10]).toordinal()),
+                                                  moment(values)))
+        added.remove(new)
+        moved.append((old, new))
+
+    def record(values):
+        entry = row_to_entry((values[0][:10],) + tuple(values[1:]))
+        return entry.to_dict()
+
+    weeks = set()
+    for values in unmatched + added + [values for pair in moved for values in pair]:
+        day = date.fromisoformat(values[0][:10])
+        weeks.add((day - timedelta(days=day.weekday())).isoformat())
+    return {
+        'added': [record(values) for values in added],
+        'removed': [record(values) for values in unmatched],
+        'moved': [{'from': record(old), 'to': record(new)} for old, new in moved],
+        'weeks': sorted(weeks),
+    }
+
+
+def record_changes(conn, version, published_at, removed, added):
+    """
+    Stores the per-group diff of a publish (removed and added COLUMNS value tuples)
+    under the new plan version and drops versions older than CHANGES_KEEP_VERSIONS.
+    'changes_from' in plan_meta is the oldest version whose changes are all kept.
+    """
+    by_group = {}
+    for side, rows in ((0, removed), (1, added)):
+        for values in rows:
+            by_group.setdefault((values[9], values[2]), ([], []))[side].append(values)
+    records = []
+    for (year, group_number), (group_removed, group_added) in sorted(by_group.items()):
+        changes = diff_group_rows(group_removed, group_added)
+        if changes is not None:
+            records.append((version, year, group_number, published_at,
+                            json.dumps(changes, ensure_ascii=False, separators=(',', ':'))))
+    conn.executemany(f"INSERT OR REPLACE INTO {CHANGES_TABLE} VALUES (?, ?, ?, ?, ?)", records)
+
+    oldest = version - CHANGES_KEEP_VERSIONS + 1
+    conn.execute(f"DELETE FROM {CHANGES_TABLE} WHERE version < ?", (oldest,))
+    changes_from = conn.execute(SELECT_META_VALUE_SQL, ('changes_from',)).fetchone()
+    changes_from = max(int(changes_from[0]) if changes_from else version, oldest)
+    conn.execute(SET_META_SQL, ('changes_from', str(changes_from)))
+
+
+def row_to_entry(row):
+    return ScheduleEntry(date.fromisoformat(row[0]), *row[1:])
+
+
+def entry_rows(entries):
+    """
+    Converts entries produced by update.py to table rows: the COLUMNS values
+    followed by the per-day sequence number and a content hash of the row.
+    """
+    seq_by_day = {}
+    for entry in entries:
+        values = tuple(entry[column] for column in COLUMNS)
+        values = (str(values[0]),) + values[1:]
+        day_key = (entry['year'], values[2], values[0])
+        seq = seq_by_day.get(day_key, 0)
+        seq_by_day[day_key] = seq + 1
+        yield values + (seq, row_hash(values, seq))
+
+
+def row_hash(values, seq):
+    return hashlib.sha1(repr(values + (seq,)).encode('utf-8')).hexdigest()
+
+
+def ensure_schema(conn):
+    """Creates the tables and indexes, upgrading a table written by DataFrame.to_sql if needed."""
+    conn.execute(CREATE_TABLE_SQL)
+    conn.execute(CREATE_META_SQL)
+    conn.execute(CREATE_CHANGES_SQL)
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+    for column, column_type in (('seq', 'INTEGER'), ('entry_hash', 'TEXT'),
+                                ('year', 'INTEGER'), ('semester', 'INTEGER')):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {column} {column_type}")
+    if 'year' not in existing:
+        assign_legacy_year(conn)
+    for index in LEGACY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+    for sql in CREATE_INDEX_SQLS:
+        conn.execute(sql)
+
+
+def assign_legacy_year(conn):
+    """
+    Marks rows stored before the year/semester columns existed as DEFAULT_YEAR /
+    LEGACY_SEMESTER and recomputes their hashes, so that re-publishing the same
+    plan is still recognized as unchanged. Rows written by DataFrame.to_sql have
+    no seq yet; they get one from their order within the group's day, which is
+    the order update.py wrote them in.
+    """
+    rows = conn.execute(
+        f"SELECT rowid, {', '.join(COLUMNS[:-2])}, seq FROM {TABLE_NAME} ORDER BY rowid"
+    ).fetchall()
+    updates = []
+    seq_by_day = {}
+    for rowid, *values, seq in rows:
+        if seq is None:
+            day_key = (values[2], values[0][:10])
+            seq = seq_by_day.get(day_key, 0)
+            seq_by_day[day_key] = seq + 1
+        values = (values[0][:10],) + tuple(values[1:]) + (DEFAULT_YEAR, LEGACY_SEMESTER)
+        updates.append((values[0], seq, DEFAULT_YEAR, LEGACY_SEMESTER, row_hash(values, seq), rowid))
+    conn.executemany(
+        f"UPDATE {TABLE_NAME} SET date = ?, seq = ?, year = ?, semester = ?, entry_hash = ? WHERE rowid = ?",
+        updates)
+
+
+def read_meta(db_path=DB_PATH):
+    """Returns all plan_meta entries as a dict (empty if nothing was published yet)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute(f"SELECT key, value FROM {META_TABLE}"))
+    except sqlite3.OperationalError:
+        return {}
+    finally:
+        conn.close()
+
+
+def write_meta(items, db_path=DB_PATH):
+    """Stores the given key/value pairs in plan_meta."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute(CREATE_META_SQL)
+            conn.executemany(SET_META_SQL, items.items())
+    finally:
+        conn.close()
+
+
+def acquire_lock(name, owner, ttl, db_path=DB_PATH):
+    """
+    Takes the named lock for `owner` for `ttl` seconds, unless another owner holds
+    an unexpired one. The lock lives in the database, so it is shared by every
+    process (web workers, the CLI updater) that uses the same plan.db; an owner
+    that dies without releasing it is replaced once the lock expires.
+    Returns True if the lock was taken.
+    """
+    now = time.time()
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(CREATE_LOCK_SQL)
+            row = conn.execute(f"SELECT owner, expires_at FROM {LOCK_TABLE} WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != owner and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(f"INSERT OR REPLACE INTO {LOCK_TABLE} (name, owner, expires_at) VALUES (?, ?, ?)",
+                         (name, owner, now + ttl))
+            conn.execute("COMMIT")
+            return True
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def release_lock(name, owner, db_path=DB_PATH):
+    """Releases the named lock if `owner` still holds it."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        with conn:
+            conn.execute(CREATE_LOCK_SQL)
+            conn.execute(f"DELETE FROM {LOCK_TABLE} WHERE name = ? AND owner = ?", (name, owner))
+    finally:
+        conn.close()
+
+
+def publish_entries(entries, db_path=DB_PATH, meta=None, years=None):
+    """
+    Publishes a freshly parsed plan by applying only the differences against
+    the stored rows, all in one transaction. If `years` is given, only rows of
+    those years are compared and replaced; other years are left untouched. When anything changed, the plan
+    version is incremented, the search index rebuilt and the per-group changes
+    recorded (see record_changes) in the same transaction. Optional `meta` key/value
+    pairs (e.g. download validators) are committed together with the plan.
+
+    The database runs in WAL mode, so readers keep seeing the previous plan
+    until the commit and are never blocked. Returns a dict with the version
+    and the numbers of inserted, deleted and total rows.
+    """
+    rows = {row[-1]: row for row in entry_rows(entries)}
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ensure_schema(conn)
+            if years is None:
+                stored = conn.execute(f"SELECT rowid, entry_hash FROM {TABLE_NAME}").fetchall()
+            else:
+                years = sorted({int(year) for year in years})
+                # Wiersze bez roku nie należą do żadnego roku, więc nie przetrwałyby żadnej publikacji
+                stored = conn.execute(
+                    f"SELECT rowid, entry_hash FROM {TABLE_NAME} "
+                    f"WHERE year IN ({', '.join('?' * len(years))}) OR year IS NULL", years
+                ).fetchall()
+            stored_hashes = {entry_hash for _, entry_hash in stored}
+            stale = [(rowid,) for rowid, entry_hash in stored if entry_hash not in rows]
+            fresh = [row for entry_hash, row in rows.items() if entry_hash not in stored_hashes]
+            # Treść usuwanych wierszy jest potrzebna do historii zmian, zanim znikną z tabeli
+            removed = []
+            for start in range(0, len(stale), 500):
+                chunk = [rowid for (rowid,) in stale[start:start + 500]]
+                removed.extend(conn.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM {TABLE_NAME} WHERE rowid IN ({', '.join('?' * len(chunk))})",
+                    chunk))
+
+            conn.executemany(f"DELETE FROM {TABLE_NAME} WHERE rowid = ?", stale)
+            conn.executemany(INSERT_SQL, fresh)
+
+            version = conn.execute(SELECT_META_VALUE_SQL, ('version',)).fetchone()
+            version = int(version[0]) if version else 0
+            if stale or fresh or not version:
+                published_at = datetime.now().isoformat(timespec='seconds')
+                # Pierwsza publikacja nie ma poprzedniego planu, z którym można by porównać
+                if version:
+                    record_changes(conn, version + 1, published_at, removed, [row[:-2] for row in fresh])
+                version += 1
+                conn.execute(SET_META_SQL, ('version', str(version)))
+                conn.execute(SET_META_SQL, ('published_at', published_at))
+            # Indeks wyszukiwania odpowiada zawsze tej samej wersji co tabela (kilka ms przy kilku tysiącach wierszy)
+            search_version = conn.execute(SELECT_META_VALUE_SQL, ('search_version',)).fetchone()
+            if search_version is None or search_version[0] != str(version):
+                rebuild_search_index(conn)
+                conn.execute(SET_META_SQL, ('search_version', str(version)))
+            if meta:
+                conn.executemany(SET_META_SQL, meta.items())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+    return {'version': version, 'inserted': len(fresh), 'deleted': len(stale), 'total': len(rows)}
@@ -0,0 +1,155 @@
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+import schedule_db
+
+# Etykieta HH:MM dla minut zapisanych w tablicy (update.py zapisuje godziny zawsze w tym formacie)
+_LABELS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(100 * 60)]
+
+
+def _minutes(label):
+    hours, minutes = label.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+class _Snapshot:
+    """Immutable column arrays of one plan version, sorted by year, group, date and seq."""
+    __slots__ = ('version', 'dates', 'starts', 'ends', 'durations', 'spacings', 'years', 'semesters',
+                 'days', 'subjects', 'colors', 'groups', 'index', 'load_seconds')
+
+    def __init__(self, version):
+        self.version = version
+        self.dates = array('i')        # date.toordinal()
+        self.starts = array('H')       # minuty od północy
+        self.ends = array('H')
+        self.durations = array('i')
+        self.spacings = array('i')
+        self.years = array('h')
+        self.semesters = array('h')
+        self.days = []                 # napisy internowane: kilka(dziesiąt) różnych wartości
+        self.subjects = []
+        self.colors = []
+        self.groups = []
+        self.index = {}                # (year, group_number) -> (lo, hi)
+        self.load_seconds = 0.0
+
+    def entry(self, i):
+        return schedule_db.ScheduleEntry(
+            date.fromordinal(self.dates[i]), self.days[i], self.groups[i], self.subjects[i],
+            _LABELS[self.starts[i]], _LABELS[self.ends[i]], self.durations[i], self.spacings[i],
+            self.colors[i], self.years[i], self.semesters[i] if self.semesters[i] >= 0 else None,
+        )
+
+    def nbytes(self):
+        """Approximate memory held by the snapshot: arrays, lists, index and distinct strings."""
+        arrays = (self.dates, self.starts, self.ends, self.durations, self.spacings, self.years, self.semesters)
+        lists = (self.days, self.subjects, self.colors, self.groups)
+        strings = {id(value): value for column in lists for value in column}
+        return (sum(sys.getsizeof(column) for column in arrays + lists)
+                + sys.getsizeof(self.index) + sum(sys.getsizeof(key) + sys.getsizeof(span)
+                                                  for key, span in self.index.items())
+                + sum(sys.getsizeof(value) for value in strings.values()))
+
+
+class ScheduleStore:
+    """
+    Process-resident, column-oriented copy of schedule_entries for the web tier.
+
+    Rows are kept in typed arrays (dates as ordinals, times as minutes) with
+    repeated strings interned, sorted by (year, group, date, seq). Every
+    (year, group) owns one contiguous slice, so a date range is found with two
+    bisections on the date column. The copy is reloaded whenever the plan
+    version passed to fetch() differs from the loaded one.
+    """
+
+    def __init__(self, db_path=schedule_db.DB_PATH):
+        self.db_path = db_path
+        self._snapshot = _Snapshot(None)
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def fetch(self, version, year, group_number, start_date, end_date):
+        """Returns ScheduleEntry objects of one group between start_date and end_date (inclusive)."""
+        snapshot = self.snapshot(version)
+        span = snapshot.index.get((int(year), str(group_number)))
+        if span is None:
+            return []
+        lo = bisect_left(snapshot.dates, start_date.toordinal(), *span)
+        hi = bisect_right(snapshot.dates, end_date.toordinal(), lo, span[1])
+        return [snapshot.entry(i) for i in range(lo, hi)]
+
+    def snapshot(self, version):
+        """Returns the loaded snapshot, reloading it first if `version` is not the loaded one."""
+        snapshot = self._snapshot
+        if not self._loaded or snapshot.version != version:
+            snapshot = self.reload(version)
+        return snapshot
+
+    def reload(self, version=None):
+        """Loads the current plan unless another thread already loaded `version`; returns the snapshot."""
+        with self._lock:
+            if self._loaded and version is not None and self._snapshot.version == version:
+                return self._snapshot
+            self._snapshot = self._load()
+            self._loaded = True
+            return self._snapshot
+
+    def _load(self):
+        started = time.perf_counter()
+        conn = schedule_db.get_connection(self.db_path)
+        try:
+            # Wersja i wiersze w jednej transakcji odczytu, żeby do siebie pasowały
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute(schedule_db.SELECT_META_VALUE_SQL, ('version',)).fetchone()
+                rows = conn.execute(schedule_db.SELECT_ALL_SQL).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            return _Snapshot(None)
+
+        snapshot = _Snapshot(row[0] if row else None)
+        interned = {}
+
+        def intern(value):
+            return interned.setdefault(value, value)
+
+        key = None
+        for (entry_date, day, group_number, subject, start, end, duration, spacing,
+             color, year, semester) in rows:
+            position = len(snapshot.dates)
+            if (year, group_number) != key:
+                if key is not None:
+                    snapshot.index[key] = (snapshot.index[key][0], position)
+                key = (year, group_number)
+                snapshot.index[key] = (position, position)
+            snapshot.dates.append(date.fromisoformat(entry_date[:10]).toordinal())
+            snapshot.starts.append(_minutes(start))
+            snapshot.ends.append(_minutes(end))
+            snapshot.durations.append(duration)
+            snapshot.spacings.append(spacing)
+            snapshot.years.append(year)
+            snapshot.semesters.append(-1 if semester is None else semester)
+            snapshot.days.append(intern(day))
+            snapshot.subjects.append(intern(subject))
+            snapshot.colors.append(intern(color))
+            snapshot.groups.append(intern(group_number))
+        if key is not None:
+            snapshot.index[key] = (snapshot.index[key][0], len(snapshot.dates))
+        snapshot.load_seconds = time.perf_counter() - started
+        return snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "rows": len(snapshot.dates),
+            "groups": len(snapshot.index),
+            "bytes": snapshot.nbytes(),
+            "load_seconds": round(snapshot.load_seconds, 4),
+        }
@@ -1,9 +1,10 @@
-import requests
-import schedule
-import time
-import os
+import asyncio
 import logging
-from datetime import datetime
+import os
+import random
+import time
+
+import requests
 
 # Konfiguracja logowania
 logging.basicConfig(
@@ -16,71 +17,136 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_update():
-    try:
-        # URL twojej aplikacji na Render.com
-        app_url = os.environ.get('RENDER_EXTERNAL_URL', 'https://your-app-name.onrender.com')
-        update_url = f"{app_url}/update"
-        
+REQUEST_TIMEOUT = 30
+JOB_POLL_INTERVAL = 5
+JOB_TIMEOUT = 300
+
+# Odstęp między sprawdzeniami: częściej, gdy plan niedawno się zmienił
+ACTIVE_INTERVAL = 30 * 60
+IDLE_INTERVAL = 6 * 60 * 60
+RECENT_CHANGE_WINDOW = 2 * 24 * 60 * 60
+JITTER = 0.1
+
+# Po błędzie: 1 min, 2 min, 4 min, ... najwyżej godzina
+RETRY_BASE = 60
+RETRY_MAX = 60 * 60
+
+
+class SystemClock:
+    """Real time source; tests pass a clock with the same two methods."""
+
+    def monotonic(self):
+        return time.monotonic()
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+class UpdateScheduler:
+    """
+    Triggers /update on the web app and waits for the queued job, one run at a time.
+
+    The delay before the next run depends on the last outcome: exponential
+    backoff with jitter after a failure, a short interval while the plan has
+    changed recently and a long one otherwise. The web app itself skips a run
+    when another worker already holds the update lock, so several schedulers
+    (or a manual /update) never parse the plan concurrently.
+    """
+
+    def __init__(self, app_url, clock=None, rng=None, get=requests.get):
+        self.app_url = app_url.rstrip('/')
+        self.clock = clock or SystemClock()
+        self.rng = rng or random.Random()
+        self.get = get
+        self.failures = 0
+        self.last_change = None
+
+    async def request_json(self, url):
+        # requests blokuje, więc wywołanie idzie do wątku, a pętla zdarzeń pozostaje wolna
+        response = await asyncio.to_thread(self.get, url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.status_code, response.json()
+
+    async def wait_for_job(self, status_url):
+        """Polls the update job status until it finishes; returns the final status or None on timeout."""
+        deadline = self.clock.monotonic() + JOB_TIMEOUT
+        while self.clock.monotonic() < deadline:
+            _, job = await self.request_json(status_url)
+            if job['state'] not in ('queued', 'running'):
+                return job
+            await self.clock.sleep(JOB_POLL_INTERVAL)
+        return None
+
+    async def run_once(self):
+        """Runs one update through the web app; returns its outcome ('updated', 'unchanged', 'skipped' or 'error')."""
+        update_url = f"{self.app_url}/update"
         logger.info(f"Rozpoczynam aktualizację planu: {update_url}")
-        
-        # Wysyłamy request do endpointu /update
-        response = requests.get(update_url, timeout=300)  # 5 minut timeout
-        
-        if response.status_code == 200:
-            result = response.json()
-            logger.info(f"Aktualizacja zakończona sukcesem: {result.get('message', 'Brak wiadomości')}")
-            if 'output' in result and result['output']:
-                logger.info(f"Output: {result['output']}")
-        else:
-            logger.error(f"Aktualizacja nie powiodła się. Status: {response.status_code}")
+        try:
+            # Endpoint /update tylko kolejkuje zadanie (202) – jego stan sprawdzamy osobno
+            status, accepted = await self.request_json(update_url)
+            if status != 202:
+                logger.error(f"Aktualizacja nie powiodła się. Status: {status}, odpowiedź: {accepted}")
+                return 'error'
+            logger.info(f"Zadanie aktualizacji {accepted['job_id']} ({accepted['status']})")
+            job = await self.wait_for_job(f"{self.app_url}{accepted['status_url']}")
+        except requests.exceptions.Timeout:
+            logger.error("Przekroczono limit czasu połączenia z aplikacją")
+            return 'error'
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logger.error(f"Błąd podczas wykonywania requestu: {str(e)}")
+            return 'error'
+
+        if job is None:
+            logger.error(f"Aktualizacja przekroczyła limit czasu ({JOB_TIMEOUT} s)")
+            return 'error'
+        if job['state'] != 'finished':
+            logger.error(f"Aktualizacja nie powiodła się: {job.get('error') or job.get('message')}")
+            return 'error'
+        logger.info(f"Aktualizacja zakończona sukcesem: {job.get('message') or 'Brak wiadomości'}")
+        logger.info(f"Etapy: {job.get('phases')}, wiersze: {job.get('rows')}")
+        return job.get('outcome') or 'unchanged'
+
+    def next_delay(self, outcome):
+        """Seconds to wait after a run with the given outcome."""
+        now = self.clock.monotonic()
+        if outcome == 'error':
+            self.failures += 1
+            delay = min(RETRY_BASE * 2 ** (self.failures - 1), RETRY_MAX)
+            # Pełny jitter: kolejne próby wielu instancji nie trafiają w ten sam moment
+            return self.rng.uniform(delay / 2, delay)
+        self.failures = 0
+        if outcome == 'updated':
+            self.last_change = now
+        recent = self.last_change is not None and now - self.last_change < RECENT_CHANGE_WINDOW
+        interval = ACTIVE_INTERVAL if recent else IDLE_INTERVAL
+        return interval * self.rng.uniform(1 - JITTER, 1 + JITTER)
+
+    async def run_forever(self, iterations=None):
+        """Runs updates until cancelled (or `iterations` runs, for tests)."""
+        done = 0
+        while iterations is None or done < iterations:
             try:
-                error_details = response.json()
-                logger.error(f"Szczegóły błędu: {error_details}")
-            except:
-                logger.error(f"Response text: {response.text}")
-            
-    except requests.exceptions.Timeout:
-        logger.error("Aktualizacja przekroczyła limit czasu (5 minut)")
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Błąd podczas wykonywania requestu: {str(e)}")
-    except Exception as e:
-        logger.error(f"Nieoczekiwany błąd: {str(e)}")
-
-# Zaplanuj zadania
-def schedule_updates():
-    # Codziennie o północy
-    schedule.every().day.at("00:00").do(run_update)
-    
-    # Dodatkowo co 6 godzin dla testów (możesz usunąć w produkcji)
-    schedule.every(6).hours.do(run_update)
-    
-    logger.info("Harmonogram zadań został ustawiony")
-    logger.info("Aktualizacje będą wykonywane codziennie o 00:00 i co 6 godzin")
+                outcome = await self.run_once()
+            except Exception as e:
+                logger.error(f"Błąd w głównej pętli schedulera: {str(e)}")
+                outcome = 'error'
+            delay = self.next_delay(outcome)
+            done += 1
+            logger.info(f"Wynik: {outcome}, następna aktualizacja za {delay / 60:.1f} min")
+            if iterations is None or done < iterations:
+                await self.clock.sleep(delay)
+
 
 if __name__ == "__main__":
     logger.info("Uruchamiam scheduled updater...")
-    
+
     # Sprawdź czy jesteśmy na Render.com
     if os.environ.get('RENDER'):
         logger.info("Środowisko: Render.com")
     else:
         logger.info("Środowisko: Lokalne")
-    
-    schedule_updates()
-    
-    # Uruchom pierwszą aktualizację przy starcie (z opóźnieniem 30s aby aplikacja zdążyła się uruchomić)
-    logger.info("Uruchamiam pierwszą aktualizację za 30 sekund...")
-    time.sleep(30)
-    run_update()
-    
-    logger.info("Scheduler działa. Sprawdzanie zaplanowanych zadań co minutę...")
-    
-    # Główna pętla
-    while True:
-        try:
-            schedule.run_pending()
-            time.sleep(60)  # Sprawdzaj co minutę
-        except Exception as e:
-            logger.error(f"Błąd w głównej pętli schedulera: {str(e)}")
-            time.sleep(60)
\ No newline at end of file
+
+    # URL twojej aplikacji na Render.com
+    app_url = os.environ.get('RENDER_EXTERNAL_URL', 'https://your-app-name.onrender.com')
+    # Pierwsza aktualizacja od razu; jeśli aplikacja jeszcze nie wstała, zadziała ponowienie z backoffem
+    asyncio.run(UpdateScheduler(app_url).run_forever())
@@ -0,0 +1,103 @@
+import hashlib
+import http.server
+import json
+import threading
+
+
+class StubSite:
+    """
+    Local stand-in for the schedule listing page and the XLSX download, with ETags.
+    `years` are the roman numerals linked on the listing, paths in `missing` answer
+    404 and `log` collects the (path, status) of every request served.
+    """
+
+    def __init__(self, xlsx):
+        self.xlsx = xlsx
+        self.update_date = '01.10.2025'
+        self.years = ['VI']
+        self.missing = set()
+        self.log = []
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path in site.missing:
+                    site.log.append((self.path, 404))
+                    self.send_error(404)
+                    return
+                body = site.listing() if self.path == '/listing' else site.xlsx
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    site.log.append((self.path, 304))
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                site.log.append((self.path, 200))
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def listing(self):
+        rows = ''.join(f'<tr><td>{year} rok – aktualizacja {self.update_date}</td>'
+                       f'<td><a href="files/{year}%20rok.xlsx">plan</a></td></tr>' for year in self.years)
+        return f'<table>{rows}</table>'.encode('utf-8')
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubUpdateApp:
+    """
+    Local stand-in for the web app's /update and /update/<id> endpoints, as polled by
+    scheduled_updater. `states` lists the job state returned by each status poll (the
+    last one repeats), `outcome` is the finished job's outcome and `update_status` the
+    HTTP status of /update itself.
+    """
+
+    def __init__(self):
+        self.states = ['finished']
+        self.outcome = 'updated'
+        self.update_status = 202
+        self.log = []
+        app = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                app.log.append(self.path)
+                if self.path == '/update':
+                    status, payload = app.update_status, {
+                        'status': 'accepted', 'job_id': 'job1', 'status_url': '/update/job1'}
+                else:
+                    polls = sum(1 for path in app.log if path != '/update')
+                    state = app.states[min(polls, len(app.states)) - 1]
+                    status, payload = 200, {
+                        'id': 'job1', 'state': state, 'error': None, 'message': f"Stub job {state}.",
+                        'outcome': app.outcome if state == 'finished' else None, 'phases': [], 'rows': {}}
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,38 @@
+import pytest
+
+import app
+
+HUGE_YEAR = '9999999999999999999999999'
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('url', [
+    f'/api/search?q=psych&year={HUGE_YEAR}',
+    f'/api/schedule?group=1&year={HUGE_YEAR}',
+    f'/api/free?groups=1&year={HUGE_YEAR}',
+    f'/api/changes?group=1&year={HUGE_YEAR}',
+    f'/calendar/{HUGE_YEAR}/1.ics',
+    f'/print/{HUGE_YEAR}/1.html',
+    '/api/search?q=psych&year=0',
+])
+def test_out_of_range_year_is_a_client_error(client, url):
+    response = client.get(url)
+
+    assert response.status_code == 400
+    assert 'year' in response.get_json()['message']
+
+
+def test_search_results_are_not_kept_in_schedule_cache(client):
+    app.schedule_cache.put(app.schedule_db.get_plan_version(), ('probe',), b'')
+    cached = len(app.schedule_cache._data)
+
+    response = client.get('/api/search?q=psych')
+
+    assert response.status_code == 200
+    assert len(app.schedule_cache._data) == cached
+    revalidated = client.get('/api/search?q=psych', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -0,0 +1,13 @@
+from werkzeug.http import parse_etags
+
+import http_cache
+
+
+def test_if_none_match_uses_weak_comparison():
+    etag = http_cache.make_etag('schedule', 1)
+
+    assert http_cache.matches(parse_etags(f'"{etag}"'), etag)
+    assert http_cache.matches(parse_etags(f'W/"{etag}"'), etag)
+    assert http_cache.matches(parse_etags(f'W/"{etag}-gzip"'), etag)
+    assert http_cache.matches(parse_etags('*'), etag)
+    assert not http_cache.matches(parse_etags(f'W/"{http_cache.make_etag("schedule", 2)}"'), etag)
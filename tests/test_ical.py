@@ -0,0 +1,44 @@
+import re
+from datetime import date
+
+import ical
+import schedule_db
+
+
+def lesson(subject, start, end, spacing_before):
+    return {'date': date(2025, 10, 8), 'day': 'ŚRODA', 'group_number': '1', 'subject': subject,
+            'start_time_formatted': start, 'end_time_formatted': end, 'duration': 0,
+            'spacing_before': spacing_before, 'background_color': '#FFFF00', 'year': 6, 'semester': 11}
+
+
+def event_uids(db_path):
+    feed = ical.build_calendar('1', schedule_db.fetch_group_entries('1', db_path, year=6)).decode('utf-8')
+    return dict(zip(re.findall(r'SUMMARY:(.*)\r\n', feed), re.findall(r'UID:(.*)\r\n', feed)))
+
+
+def test_uids_survive_changes_to_other_lessons_of_the_day(tmp_path):
+    db_path = str(tmp_path / 'plan.db')
+    schedule_db.publish_entries([lesson('psych', '10:00', '11:30', 210),
+                                 lesson('interna', '12:00', '13:30', 30)], db_path)
+    before = event_uids(db_path)
+
+    # Nowe pierwsze zajęcia zmieniają seq i spacing_before pozostałych, a więc ich entry_hash
+    schedule_db.publish_entries([lesson('chirurgia', '08:00', '09:30', 90),
+                                 lesson('psych', '10:00', '11:30', 30),
+                                 lesson('interna', '12:00', '13:30', 30)], db_path)
+    after = event_uids(db_path)
+
+    assert after['psych'] == before['psych']
+    assert after['interna'] == before['interna']
+    assert len(set(after.values())) == 3
+
+
+def test_identical_lessons_get_distinct_uids(tmp_path):
+    db_path = str(tmp_path / 'plan.db')
+    schedule_db.publish_entries([lesson('psych', '10:00', '11:30', 210),
+                                 lesson('psych', '10:00', '11:30', 0)], db_path)
+
+    feed = ical.build_calendar('1', schedule_db.fetch_group_entries('1', db_path, year=6)).decode('utf-8')
+
+    uids = re.findall(r'UID:(.*)\r\n', feed)
+    assert len(uids) == 2 and len(set(uids)) == 2
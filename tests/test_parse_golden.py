@@ -0,0 +1,52 @@
+"""
+Golden test of the sheet parser: plan_downloaded.xlsx must give exactly the
+rows, in the same order, that the original pandas parser stored in plan.db
+before any of the parsing changes (frozen in fixtures/plan_downloaded_rok6.json.gz).
+"""
+import gzip
+import json
+import os
+import zipfile
+
+import update
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'plan_downloaded_rok6.json.gz')
+FIELDS = ('date', 'day', 'group_number', 'subject', 'start_time_formatted', 'end_time_formatted',
+          'duration', 'spacing_before', 'background_color')
+
+
+def test_parse_matches_frozen_rows_in_order():
+    with gzip.open(FIXTURE, 'rt', encoding='utf-8') as f:
+        expected = [tuple(row) for row in json.load(f)]
+
+    entries = update.load_and_process_data_rok6(os.path.join(ROOT, 'plan_downloaded.xlsx'))
+
+    actual = [tuple(entry['date'].isoformat() if field == 'date' else entry[field] for field in FIELDS)
+              for entry in entries]
+    assert len(actual) == len(expected)
+    for i, (row, golden) in enumerate(zip(actual, expected)):
+        assert row == golden, f"row {i} differs"
+    assert {(entry['year'], entry['semester']) for entry in entries} == {(6, 11)}
+
+
+def test_other_semester_sheets_are_detected_not_pinned(tmp_path):
+    # Przypięty układ dotyczy tylko 'semestr 11'; ten sam arkusz jako 'semestr 12' musi zostać wykryty
+    assert update.sheet_layout(6, 'semestr 12') == update.DEFAULT_LAYOUT
+    # Zmiana nazwy w samym workbook.xml – zapis przez openpyxl gubi część scalonych komórek
+    renamed = str(tmp_path / 'plan.xlsx')
+    with zipfile.ZipFile(os.path.join(ROOT, 'plan_downloaded.xlsx')) as source, \
+            zipfile.ZipFile(renamed, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item)
+            if item.filename == 'xl/workbook.xml':
+                data = data.replace(b'name="semestr 11"', b'name="semestr 12"')
+            target.writestr(item, data)
+
+    entries = update.parse_workbooks({6: renamed})[6]
+
+    with gzip.open(FIXTURE, 'rt', encoding='utf-8') as f:
+        expected = [tuple(row) for row in json.load(f)]
+    assert [tuple(entry['date'].isoformat() if field == 'date' else entry[field] for field in FIELDS)
+            for entry in entries] == expected
+    assert {entry['semester'] for entry in entries} == {12}
@@ -0,0 +1,63 @@
+import gzip
+import json
+import os
+import sqlite3
+from datetime import date
+
+import schedule_db
+from schedule_store import ScheduleStore
+from test_parse_golden import FIELDS, FIXTURE
+
+# Tabela w postaci, w jakiej zapisywał ją DataFrame.to_sql przed zmianami publikacji
+TO_SQL_TABLE = f"""
+CREATE TABLE {schedule_db.TABLE_NAME} (
+    date DATE, day TEXT, group_number TEXT, subject TEXT, start_time_formatted TEXT,
+    end_time_formatted TEXT, duration BIGINT, spacing_before BIGINT, background_color TEXT
+)
+"""
+
+
+def test_publish_over_a_to_sql_table_replaces_it_in_place(tmp_path):
+    with gzip.open(FIXTURE, 'rt', encoding='utf-8') as f:
+        rows = json.load(f)
+    db_path = str(tmp_path / 'plan.db')
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(TO_SQL_TABLE)
+        conn.executemany(f"INSERT INTO {schedule_db.TABLE_NAME} VALUES ({', '.join('?' * len(FIELDS))})", rows)
+    conn.close()
+
+    entries = [dict(zip(FIELDS, row), year=6, semester=11) for row in rows]
+    for entry in entries:
+        entry['date'] = date.fromisoformat(entry['date'])
+    # Ten sam plan co w tabeli: po migracji nic się nie zmienia
+    result = schedule_db.publish_entries(entries, db_path, years=[6])
+    assert (result['inserted'], result['deleted'], result['total']) == (0, 0, len(rows))
+
+    # Zmiana jednej lekcji zastępuje tylko ją, bez drugiej kopii planu
+    entries[0]['subject'] += ' (zmiana)'
+    result = schedule_db.publish_entries(entries, db_path, years=[6])
+    assert (result['inserted'], result['deleted']) == (1, 1)
+
+    conn = sqlite3.connect(db_path)
+    count, without_year = conn.execute(
+        f"SELECT COUNT(*), COUNT(*) - COUNT(year) FROM {schedule_db.TABLE_NAME}").fetchone()
+    conn.close()
+    assert (count, without_year) == (len(rows), 0)
+    assert len(ScheduleStore(db_path).reload().dates) == len(rows)
+
+
+def test_store_reads_rows_without_year_as_default_year(tmp_path):
+    db_path = str(tmp_path / 'plan.db')
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(schedule_db.CREATE_TABLE_SQL)
+        conn.execute(schedule_db.CREATE_META_SQL)
+        conn.execute(f"INSERT INTO {schedule_db.TABLE_NAME} (date, day, group_number, subject, start_time_formatted, "
+                     "end_time_formatted, duration, spacing_before, background_color, seq) "
+                     "VALUES ('2025-10-08', 'ŚRODA', '1', 'psych', '08:00', '09:30', 90, 90, '#FFFF00', 0)")
+    conn.close()
+
+    snapshot = ScheduleStore(db_path).reload()
+
+    assert list(snapshot.index) == [(schedule_db.DEFAULT_YEAR, '1')]
@@ -0,0 +1,126 @@
+"""UpdateScheduler with a fake clock against a local stand-in for the web app (stub_site.StubUpdateApp)."""
+import asyncio
+
+import pytest
+
+import scheduled_updater
+from scheduled_updater import (ACTIVE_INTERVAL, IDLE_INTERVAL, JOB_POLL_INTERVAL, JOB_TIMEOUT,
+                               RECENT_CHANGE_WINDOW, RETRY_BASE, RETRY_MAX, UpdateScheduler)
+from stub_site import StubUpdateApp
+
+
+class FakeClock:
+    """Time that only moves when the scheduler sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class UpperBound:
+    """rng whose uniform() always returns the upper bound, so delays are deterministic."""
+
+    def uniform(self, low, high):
+        return high
+
+
+@pytest.fixture
+def app():
+    app = StubUpdateApp()
+    yield app
+    app.close()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def scheduler(app, clock):
+    return UpdateScheduler(app.base_url, clock=clock, rng=UpperBound())
+
+
+def test_backoff_doubles_after_each_error_up_to_the_cap(clock):
+    updater = UpdateScheduler('http://unused', clock=clock, rng=UpperBound())
+
+    delays = [updater.next_delay('error') for _ in range(9)]
+
+    assert delays == [RETRY_BASE * 2 ** i for i in range(6)] + [RETRY_MAX] * 3
+    assert RETRY_BASE * 2 ** 6 > RETRY_MAX
+
+
+def test_success_resets_backoff(clock):
+    updater = UpdateScheduler('http://unused', clock=clock, rng=UpperBound())
+    for _ in range(3):
+        updater.next_delay('error')
+
+    updater.next_delay('unchanged')
+
+    assert updater.next_delay('error') == RETRY_BASE
+
+
+def test_interval_is_shorter_for_a_while_after_an_update(clock):
+    updater = UpdateScheduler('http://unused', clock=clock, rng=UpperBound())
+    jitter = 1 + scheduled_updater.JITTER
+
+    assert updater.next_delay('unchanged') == IDLE_INTERVAL * jitter
+    assert updater.next_delay('updated') == ACTIVE_INTERVAL * jitter
+    clock.now += RECENT_CHANGE_WINDOW - 1
+    assert updater.next_delay('unchanged') == ACTIVE_INTERVAL * jitter
+    clock.now += 2
+    assert updater.next_delay('unchanged') == IDLE_INTERVAL * jitter
+
+
+def test_finished_job_reports_its_outcome(app, clock):
+    app.states = ['running', 'finished']
+
+    assert asyncio.run(scheduler(app, clock).run_once()) == 'updated'
+    assert app.log == ['/update', '/update/job1', '/update/job1']
+    assert clock.sleeps == [JOB_POLL_INTERVAL]
+
+
+def test_skipped_job_is_not_an_error(app, clock):
+    app.outcome = 'skipped'
+    updater = scheduler(app, clock)
+
+    assert asyncio.run(updater.run_once()) == 'skipped'
+    assert updater.next_delay('skipped') == IDLE_INTERVAL * (1 + scheduled_updater.JITTER)
+    assert updater.failures == 0
+
+
+def test_failed_job_and_rejected_trigger_are_errors(app, clock):
+    app.states = ['failed']
+    assert asyncio.run(scheduler(app, clock).run_once()) == 'error'
+
+    app.log.clear()
+    app.update_status = 500
+    assert asyncio.run(scheduler(app, clock).run_once()) == 'error'
+    assert app.log == ['/update']
+
+
+def test_unreachable_app_is_an_error(clock):
+    updater = UpdateScheduler('http://127.0.0.1:9', clock=clock, rng=UpperBound())
+
+    assert asyncio.run(updater.run_once()) == 'error'
+
+
+def test_polling_gives_up_after_job_timeout(app, clock):
+    app.states = ['running']
+
+    assert asyncio.run(scheduler(app, clock).run_once()) == 'error'
+    assert clock.now >= JOB_TIMEOUT
+    assert len(app.log) - 1 == JOB_TIMEOUT // JOB_POLL_INTERVAL
+
+
+def test_run_forever_sleeps_the_computed_delay_between_runs(app, clock):
+    asyncio.run(scheduler(app, clock).run_forever(iterations=2))
+
+    assert app.log.count('/update') == 2
+    assert clock.sleeps.count(ACTIVE_INTERVAL * (1 + scheduled_updater.JITTER)) == 1
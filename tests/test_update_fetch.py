@@ -0,0 +1,143 @@
+"""
+Conditional fetching in update.py against the local stand-in of the university
+site (stub_site.StubSite): 304 on the listing and on the workbook, an
+identical SHA-256 skipping the parse, listing validators kept unsaved while a
+year fails, and render artifacts rebuilt by runs that find no changes.
+"""
+import json
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import artifacts
+import schedule_db
+import update
+from conftest import ROOT
+from stub_site import StubSite
+
+
+def phase_names(report):
+    return [phase['name'] for phase in report.phases]
+
+
+@pytest.fixture(scope='module')
+def stub_site():
+    # Walidatory zapisywane są razem z URL-em, więc wszystkie testy korzystają z jednego serwera
+    with open(os.path.join(ROOT, 'plan_downloaded.xlsx'), 'rb') as f:
+        site = StubSite(f.read())
+    saved = update.CHECK_URL, update.DOWNLOAD_BASE_URL
+    update.CHECK_URL, update.DOWNLOAD_BASE_URL = site.base_url + 'listing', site.base_url
+    yield site
+    update.CHECK_URL, update.DOWNLOAD_BASE_URL = saved
+    site.close()
+
+
+@pytest.fixture(scope='module')
+def published(stub_site, tmp_path_factory):
+    """plan.db after one full update from the stand-in site."""
+    path = tmp_path_factory.mktemp('published')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(path)
+        report = update.main()
+    assert report.outcome == 'updated', report.message
+    return path / 'plan.db'
+
+
+@pytest.fixture
+def site(stub_site, published):
+    stub_site.update_date = '01.10.2025'
+    stub_site.years = ['VI']
+    stub_site.missing.clear()
+    stub_site.log.clear()
+    return stub_site
+
+
+@pytest.fixture
+def workdir(published, tmp_path, monkeypatch):
+    shutil.copy(published, tmp_path / 'plan.db')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_conditional_get_sends_stored_validators(site):
+    first = update.conditional_get(update.CHECK_URL, {})
+    assert first.status_code == 200
+
+    second = update.conditional_get(update.CHECK_URL, {'etag': first.headers['ETag']})
+    assert second.status_code == 304
+    assert site.log == [('/listing', 200), ('/listing', 304)]
+
+
+def test_listing_not_modified_stops_after_one_request(site, workdir):
+    report = update.main()
+
+    assert report.outcome == 'unchanged'
+    assert 'listing not modified' in report.message
+    assert site.log == [('/listing', 304)]
+    assert 'parse' not in phase_names(report)
+
+
+def test_workbook_not_modified_skips_parse(site, workdir):
+    site.update_date = '02.10.2025'
+
+    report = update.main()
+
+    assert report.outcome == 'unchanged'
+    assert site.log == [('/listing', 200), ('/files/VI%20rok.xlsx', 304)]
+    assert 'parse' not in phase_names(report)
+    meta = schedule_db.read_meta('plan.db')
+    assert meta['source_6'].startswith('02.10.2025|')
+
+
+def test_identical_hash_skips_parse(site, workdir):
+    site.update_date = '02.10.2025'
+    # Bez walidatorów serwer odda cały plik (200) – o pominięciu decyduje wtedy tylko SHA-256
+    schedule_db.write_meta({'xlsx_6_validators': '{}'}, 'plan.db')
+    version = schedule_db.read_meta('plan.db')['version']
+
+    report = update.main()
+
+    assert report.outcome == 'unchanged'
+    assert site.log == [('/listing', 200), ('/files/VI%20rok.xlsx', 200)]
+    assert 'parse' not in phase_names(report)
+    meta = schedule_db.read_meta('plan.db')
+    assert meta['version'] == version
+    assert json.loads(meta['xlsx_6_validators'])['etag']
+
+
+def test_failed_year_keeps_listing_validators_unsaved(site, workdir):
+    listing_validators = schedule_db.read_meta('plan.db')['listing_validators']
+    site.years = ['V', 'VI']
+    site.missing.add('/files/V%20rok.xlsx')
+
+    report = update.main()
+
+    assert report.outcome == 'error'
+    assert 'year 5' in report.message
+    meta = schedule_db.read_meta('plan.db')
+    assert meta['listing_validators'] == listing_validators
+    assert 'source_5' not in meta
+
+    # Kolejne uruchomienie nie dostaje 304 na liście, więc ponawia pobranie roku 5
+    site.log.clear()
+    update.main()
+    assert site.log[:2] == [('/listing', 200), ('/files/V%20rok.xlsx', 404)]
+
+
+def test_unchanged_run_builds_missing_printables(site, workdir):
+    # Pełna ścieżka: połączenia do odczytu są w puli według ścieżki, a testy zmieniają katalog
+    db_path = str(workdir / 'plan.db')
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(f"DROP TABLE {artifacts.PRINT_TABLE}")
+    conn.close()
+    assert artifacts.load_printable(1, 6, '1', db_path) is None
+
+    report = update.main()
+
+    assert report.outcome == 'unchanged'
+    assert site.log == [('/listing', 304)]
+    assert report.rows['printables'] > 0 and report.rows['artifacts'] == 0
+    assert artifacts.load_printable(1, 6, '1', db_path)[0] == 1
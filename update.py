@@ -1,33 +1,111 @@
 import requests
 from bs4 import BeautifulSoup
 import os
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from urllib.parse import unquote
 import re
+import json
+import hashlib
+import multiprocessing
 import locale
 from openpyxl import load_workbook
 from openpyxl.styles.colors import Color
-from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+from xml.etree import ElementTree
+import socket
 import sys
+import threading
+import zipfile
+import schedule_db
+from parse_cache import ParseCache
+import artifacts
+from jobs import UpdateReport
 
 # Konfiguracja dla Render.com
 if 'RENDER' in os.environ:
     # Render.com specific configuration
-    DB_URL = 'sqlite:///plan.db'
+    DB_PATH = 'plan.db'
     FILE_PATH = '/tmp/plan_downloaded.xlsx'
 else:
     # Local development
-    DB_URL = 'sqlite:///plan.db'
+    DB_PATH = 'plan.db'
     FILE_PATH = 'plan_downloaded.xlsx'
 
+# Wyniki parsowania arkuszy (zob. parse_cache.py) leżą obok bazy
+PARSE_CACHE_PATH = os.path.join(os.path.dirname(DB_PATH), 'plan_parse_cache.pickle')
+# Zmiana sposobu ekstrakcji wymaga podbicia wersji, inaczej użyte zostałyby stare wyniki
+PARSE_CACHE_VERSION = 1
+
 try:
     locale.setlocale(locale.LC_TIME, 'pl_PL.UTF-8')
 except locale.Error:
     print("Nie można ustawić polskich locale. Dni tygodnia mogą być po angielsku.")
 
-TABLE_NAME = 'schedule_entries'
+# Liczby, które mogą być godzinami (np. '8', '8.00', '13:15'); ten sam wzorzec porównuje zmiany planu
+TIME_PATTERN = schedule_db.TIME_PATTERN
+# Etykiety HH:MM dla każdej minuty, jaką może zwrócić TIME_PATTERN (do 99:99)
+MINUTE_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(99 * 60 + 100)], dtype=object)
+# Odstęp przed pierwszymi zajęciami w dniu liczony jest od 6:30
+DAY_START_MINUTES = 7 * 60 - 30
+DEFAULT_COLOR = "#FFD966"
+POLISH_DAYS = {
+    0: "PONIEDZIAŁEK",
+    1: "WTOREK",
+    2: "ŚRODA",
+    3: "CZWARTEK",
+    4: "PIĄTEK",
+    5: "Sobota",
+    6: "Niedziela"
+}
 CHECK_URL = 'https://www.ur.edu.pl/pl/collegium-medicum-2/collegium-medicum/jednostki/wydzial-medyczny/student/lekarski/rozklady-zajec'
+DOWNLOAD_BASE_URL = 'https://www.ur.edu.pl/'
+REQUEST_TIMEOUT = 60
+# Pliki kolejnych lat pobierane są równolegle, arkusze parsowane w osobnych procesach
+DOWNLOAD_WORKERS = 4
+# Blokada aktualizacji wygasa sama, gdyby proces, który ją trzyma, zginął
+UPDATE_LOCK_TTL = 15 * 60
+PARSE_WORKERS = os.cpu_count() or 1
+# Aktualizacja działa w wątku wielowątkowego workera gunicorna: fork skopiowałby blokady
+# trzymane przez inne wątki, więc procesy parsujące startują z serwera forkserver
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+# Link do planu roku, np. 'files/VI%20rok.xlsx' -> 'VI'
+YEAR_LINK_PATTERN = re.compile(r'\b([IVX]+)\s*rok\b', re.IGNORECASE)
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10}
+SEMESTER_SHEET_PATTERN = re.compile(r'semestr\s*(\d+)', re.IGNORECASE)
+# Wiersz z datami szukany jest wśród pierwszych wierszy arkusza
+DETECT_ROWS = 20
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    """Where the schedule grid of one sheet lives; a None column/row is detected from the sheet contents."""
+    group_col: int | None = None
+    date_row: int | None = None
+
+
+# Układy arkuszy znane z góry, (rok, arkusz) -> SheetLayout; pozostałe arkusze (także nowe
+# semestry tych lat) wykrywane są automatycznie
+LAYOUTS = {
+    (6, 'semestr 11'): SheetLayout(group_col=18, date_row=3),
+}
+DEFAULT_LAYOUT = SheetLayout()
+
+
+@dataclass(frozen=True)
+class ScheduleSource:
+    """One year's schedule link found on the listing page."""
+    year: int
+    link: str
+    update_date: str
+
+    @property
+    def key(self):
+        return f"{self.update_date}|{self.link}"
 
 def determine_gradient_class(subject):
     """Determines the CSS gradient class based on the subject name."""
@@ -50,10 +128,7 @@ def parse_time_range(text):
     if not isinstance(text, str):
         return None, None
     
-    # Ten wzorzec (wyrażenie regularne) znajduje liczby, które mogą być godzinami,
-    # z opcjonalną częścią minutową (np. '8', '8.00', '13:15').
-    pattern = re.compile(r'\b(\d{1,2}(?:[.:]\d{2})?)\b')
-    matches = pattern.findall(text)
+    matches = TIME_PATTERN.findall(text)
     
     if len(matches) < 2:
         return None, None # Nie znaleziono wystarczającej liczby znaczników czasu
@@ -76,23 +151,38 @@ def parse_time_range(text):
         # Zabezpieczenie na wypadek, gdyby znalezione liczby nie były poprawnym czasem
         return None, None
 
-def get_cell_color(cell, sheet):
+MERGE_CELL_TAG = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}mergeCell'
+
+def read_merged_ranges(sheet):
+    """
+    Reads merged ranges of a read-only worksheet straight from its XML
+    (openpyxl does not expose `merged_cells` in read-only mode).
+    """
+    ranges = []
+    with sheet._get_source() as src:
+        for _, element in ElementTree.iterparse(src):
+            if element.tag == MERGE_CELL_TAG:
+                ranges.append(CellRange(element.get('ref')))
+            element.clear()
+    return ranges
+
+def build_merged_lookup(merged_ranges):
     """
-    Ulepszona funkcja do pobierania koloru tła komórki w formacie HEX (#RRGGBB).
-    Poprawnie obsługuje komórki scalone i kolory z motywu Excela.
+    Maps every (row, col) covered by a merged range to the (row, col) of its
+    top-left master cell (1-based, like openpyxl).
     """
-    # Krok 1: Jeśli komórka jest scalona, znajdź jej komórkę główną (lewy górny róg),
-    # ponieważ styl, w tym kolor, jest zapisany tylko w tej jednej komórce.
-    for merged_range in sheet.merged_cells.ranges:
-        if cell.coordinate in merged_range:
-            cell = sheet.cell(row=merged_range.min_row, column=merged_range.min_col)
-            break # Znaleziono, można przerwać pętlę
-
-    # Krok 2: Pobierz informacje o wypełnieniu komórki.
+    lookup = {}
+    for merged_range in merged_ranges:
+        min_col, min_row, max_col, max_row = merged_range.bounds
+        master = (min_row, min_col)
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                lookup[(row, col)] = master
+    return lookup
+
+def get_fill_color(fill):
+    """Converts a cell fill to a HEX colour (#RRGGBB) or None."""
     # W przypadku jednolitego tła kolor znajduje się w atrybucie `fgColor` (kolor pierwszoplanowy).
-    fill = cell.fill
-    
-    # Krok 3: Wyodrębnij właściwy obiekt koloru.
     color_obj = None
     if fill.patternType == 'solid':
         color_obj = fill.fgColor
@@ -100,7 +190,7 @@ def get_cell_color(cell, sheet):
          # Dla innych wzorów (np. gradientów) `start_color` może być istotny.
         color_obj = fill.start_color
 
-    # Krok 4: Przekonwertuj obiekt koloru na format HEX (#RRGGBB).
+    # Przekonwertuj obiekt koloru na format HEX (#RRGGBB).
     if color_obj and hasattr(color_obj, 'rgb') and color_obj.rgb:
         # Wartość `rgb` jest zazwyczaj w formacie AARRGGBB (Alfa, Czerwony, Zielony, Niebieski).
         # My potrzebujemy tylko ostatnich 6 znaków, czyli RRGGBB.
@@ -114,260 +204,625 @@ def get_cell_color(cell, sheet):
     # Jeśli nie udało się znaleźć żadnego koloru, zwróć None.
     return None
 
+def read_sheet(sheet):
+    """
+    Streams a (read-only) sheet once and returns two 0-based grids: raw cell
+    values and fill colours of the non-empty cells.
+    """
+    values, colors = [], []
+    for row in sheet.iter_rows():
+        row_values, row_colors = [], []
+        for cell in row:
+            color = None
+            if cell.value is not None:
+                try:
+                    color = get_fill_color(cell.fill)
+                except Exception:
+                    # np. kolory z motywu bez wartości RGB
+                    color = None
+            row_values.append(cell.value)
+            row_colors.append(color)
+        values.append(row_values)
+        colors.append(row_colors)
+    return values, colors
 
-
-def load_and_process_data_rok6(file_path):
+def fill_merged_cells(values, colors, merged_lookup):
     """
-    Loads and processes the new schedule format for the 6th year.
-    The schedule is laid out horizontally (days in columns).
+    Returns copies of the value and colour grids where cells covered by a merged
+    range take the value and colour of its top-left cell, so e.g. a lesson merged
+    across several group rows is seen by every group.
     """
+    rows = [list(row) for row in values]
+    row_colors = [list(row) for row in colors]
+    for (row, col), (master_row, master_col) in merged_lookup.items():
+        if row > len(rows) or master_row > len(rows) or col > len(rows[row - 1]):
+            continue
+        # Styl (kolor) zapisany jest tylko w komórce głównej
+        row_colors[row - 1][col - 1] = colors[master_row - 1][master_col - 1]
+        master_value = values[master_row - 1][master_col - 1]
+        if master_value:
+            rows[row - 1][col - 1] = master_value
+    return rows, row_colors
+
+def time_to_minutes(times):
+    """Vectorized conversion of '8' / '8.00' / '13:15' strings to minutes since midnight."""
+    # '13:15' -> 13.15: część całkowita to godziny, dwie cyfry po przecinku to minuty
+    values = pd.to_numeric(times.str.replace(':', '.', regex=False))
+    hours = np.floor(values)
+    return (hours * 60 + np.rint((values - hours) * 100)).astype(int)
+
+def format_minutes(minutes):
+    """Vectorized conversion of minutes since midnight to HH:MM strings (table lookup)."""
+    return pd.Series(MINUTE_LABELS[minutes.to_numpy()], index=minutes.index)
+
+def find_group_rows(rows, group_col_idx, first_group_row):
+    """Returns (row index, group number) of every row with a group number."""
+    # Numery grup (kilkadziesiąt wierszy) odczytujemy zwykłą pętlą
+    group_rows = []
+    for index in range(first_group_row, len(rows)):
+        group_number = rows[index][group_col_idx]
+        if group_number is None or not str(group_number).strip():
+            continue
+        try:
+            group_rows.append((index, int(group_number)))
+        except (ValueError, TypeError):
+            continue
+    return group_rows
 
-    from openpyxl import load_workbook
-    wb = load_workbook(file_path, data_only=True)
-    sheet = wb["semestr 11"]
-    try:
-        df = pd.read_excel(file_path, sheet_name='semestr 11', header=None)
-    except Exception as e:
-        print(f"Error reading Excel file: {e}")
+def extract_entries(rows, colors, group_col_idx, first_group_row, col_to_date_map):
+    """
+    Turns the group x date grid into schedule entries.
+
+    The grid is flattened row by row into a long frame (one row per cell) and
+    time parsing, durations, gaps and formatting are computed column-wise.
+    Entries come out in the same order as a row-by-row, left-to-right walk
+    over the sheet.
+    """
+    group_rows = find_group_rows(rows, group_col_idx, first_group_row)
+    date_cols = sorted(col_to_date_map)
+    if not group_rows or not date_cols:
         return []
 
-    all_entries = []
+    row_idx = [index for index, _ in group_rows]
+    groups = [group for _, group in group_rows]
+    cells = np.array([[rows[i][c] for c in date_cols] for i in row_idx], dtype=object)
+    cell_colors = np.array([[colors[i][c] for c in date_cols] for i in row_idx], dtype=object)
+
+    # "Melt": spłaszczamy siatkę wiersz po wierszu do jednej komórki na wiersz ramki.
+    # dtype=object zostaje, aby pandas nie zamieniał liczb całkowitych na float (str(8) != str(8.0)).
+    grid = pd.DataFrame({
+        'group': np.repeat(groups, len(date_cols)),
+        'col': np.tile(date_cols, len(row_idx)),
+        'cell': cells.ravel(),
+        'color': cell_colors.ravel(),
+    })
+    grid = grid[grid['cell'].notna()]
+    grid['text'] = grid['cell'].astype(str)
+    grid = grid[grid['text'].str.strip() != '']
+
+    # Dwa pierwsze wystąpienia godzin w komórce to początek i koniec zajęć
+    matches = grid['text'].str.findall(TIME_PATTERN)
+    grid['start_text'] = matches.str[0]
+    grid['end_text'] = matches.str[1]
+    grid = grid.dropna(subset=['start_text', 'end_text'])
+    grid['start'] = time_to_minutes(grid['start_text'])
+    grid['end'] = time_to_minutes(grid['end_text'])
+    grid['duration'] = grid['end'] - grid['start']
+    grid = grid[grid['duration'] >= 0]  # Sanity check
+
+    dates = {col: col_to_date_map[col].date() for col in date_cols}
+    grid['date'] = grid['col'].map(dates)
+
+    # Odstęp od końca poprzednich zajęć tej grupy w danym dniu (lub od początku dnia)
+    previous_end = grid.groupby(['date', 'group'], sort=False)['end'].shift(1).fillna(DAY_START_MINUTES)
+    spacing_before = (grid['start'] - previous_end).clip(lower=0).astype(int)
+
+    columns = {
+        'date': grid['date'],
+        'day': grid['date'].map(lambda d: POLISH_DAYS[d.weekday()]),
+        'group_number': grid['group'].astype(str),
+        'subject': grid['text'].str.split().str.join(' '),
+        'start_time_formatted': format_minutes(grid['start']),
+        'end_time_formatted': format_minutes(grid['end']),
+        'duration': grid['duration'],
+        'spacing_before': spacing_before,
+        'background_color': grid['color'].fillna(DEFAULT_COLOR),
+    }
+    # tolist() zwraca natywne typy Pythona i jest znacznie szybsze niż DataFrame.to_dict('records')
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+
+def detect_date_row(values):
+    """Returns the index of the row (among the first DETECT_ROWS) holding the most dates, or None."""
+    best_row, best_count = None, 1
+    for index, row in enumerate(values[:DETECT_ROWS]):
+        count = sum(isinstance(value, datetime) for value in row)
+        if count > best_count:
+            best_row, best_count = index, count
+    return best_row
+
+def detect_group_col(values, date_row, first_date_col):
+    """
+    Returns the column left of the dates holding the most distinct whole numbers below
+    date_row. Group numbers are unique per row, unlike e.g. the per-row counters in
+    the sheet's legend columns; on a tie the column nearest to the dates wins.
+    """
+    numbers = [set() for _ in range(first_date_col)]
+    for row in values[date_row + 1:]:
+        for col, value in enumerate(row[:first_date_col]):
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and not pd.isna(value):
+                numbers[col].add(value)
+    best = max(range(first_date_col), key=lambda col: (len(numbers[col]), col), default=None)
+    return best if best is not None and len(numbers[best]) > 1 else None
+
+def locate_grid(values, layout):
+    """
+    Finds the group column, the first group row and the date of every day column
+    of a sheet, using the values pinned in `layout` and detecting the rest.
+    Returns (group_col, first_group_row, col_to_date_map) or None with a message printed.
+    """
+    date_row = layout.date_row if layout.date_row is not None else detect_date_row(values)
+    if date_row is None or date_row >= len(values):
+        print("Could not find the row with dates.")
+        return None
+    date_row_values = values[date_row]
+
+    group_col = layout.group_col
+    if group_col is None:
+        first_date = next((i for i, value in enumerate(date_row_values) if isinstance(value, datetime)), None)
+        group_col = detect_group_col(values, date_row, first_date) if first_date else None
+    if group_col is None:
+        print("Could not find the column with group numbers.")
+        return None
 
-    GROUP_COL_IDX = 18
     first_group_row = -1
-    for i, val in enumerate(df[GROUP_COL_IDX]):
+    for i, row in enumerate(values):
+        val = row[group_col] if len(row) > group_col else None
         if isinstance(val, (int, float)) and not pd.isna(val):
             first_group_row = i
             break
 
     if first_group_row == -1:
-        print("Could not find the starting row for groups in column S.")
-        return []
+        print(f"Could not find the starting row for groups in column {group_col}.")
+        return None
 
-    date_row_idx = 3
-    date_row = df.iloc[date_row_idx]
     first_date_col = -1
-    for i in range(GROUP_COL_IDX + 1, len(date_row)):
-        if isinstance(date_row[i], datetime):
+    for i in range(group_col + 1, len(date_row_values)):
+        if isinstance(date_row_values[i], datetime):
             first_date_col = i
             break
 
     if first_date_col == -1:
         print("Could not find the starting column for dates.")
-        return []
-    #  --- Inteligentne wypełnianie na podstawie scalonych komórek z pliku XLSX ---
-
-    # Iterujemy po wszystkich scalonych zakresach w arkuszu. To jest klucz do poprawnego odczytu struktury.
-    for merged_range in sheet.merged_cells.ranges:
-        # Pobieramy współrzędne (granice) każdego scalonego bloku
-        min_col, min_row, max_col, max_row = merged_range.bounds
-        
-        # Odczytujemy wartość z lewej górnej komórki scalonego bloku
-        top_left_cell_value = sheet.cell(row=min_row, column=min_col).value
-
-        # Jeśli komórka nie jest pusta, to jej wartość jest "rozsiewana" na cały obszar,
-        # który obejmował scalony blok w DataFrame.
-        if top_left_cell_value:
-            # Używamy .loc do przypisania wartości. Pamiętamy o konwersji indeksów:
-            # openpyxl jest 1-based (liczy od 1), a pandas jest 0-based (liczy od 0).
-            # Dlatego odejmujemy 1 od każdego indeksu wiersza i kolumny.
-            df.loc[min_row-1:max_row-1, min_col-1:max_col-1] = top_left_cell_value
-
+        return None
 
     col_to_date_map = {}
     current_date = None
-    for i in range(first_date_col, len(date_row)):
-        if isinstance(date_row[i], datetime):
-            current_date = date_row[i]
+    for i in range(first_date_col, len(date_row_values)):
+        if isinstance(date_row_values[i], datetime):
+            current_date = date_row_values[i]
         if current_date:
             col_to_date_map[i] = current_date
 
-    last_end_by_date_group = {}
+    return group_col, first_group_row, col_to_date_map
 
-    for index, row in df.iloc[first_group_row:].iterrows():
-        group_number = row[GROUP_COL_IDX]
+def semester_of(sheet_name):
+    match = SEMESTER_SHEET_PATTERN.search(sheet_name)
+    return int(match.group(1)) if match else None
 
-        if pd.isna(group_number) or not str(group_number).strip():
-            continue
+def sheet_layout(year, sheet_name):
+    return LAYOUTS.get((year, sheet_name.strip()), DEFAULT_LAYOUT)
 
+def schedule_sheets(file_path, year):
+    """
+    Returns {sheet name: fingerprint} of the sheets of a year's workbook named
+    'semestr N'. The fingerprint hashes the sheet's layout and XML part together with
+    the shared strings and styles it refers to, so an unchanged sheet keeps its
+    fingerprint even when other sheets of the workbook change it does not depend on.
+    """
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        names = [name for name in wb.sheetnames if SEMESTER_SHEET_PATTERN.fullmatch(name.strip())]
+        parts = {name: wb[name]._worksheet_path for name in names}
+    finally:
+        wb.close()
+
+    fingerprints = {}
+    with zipfile.ZipFile(file_path) as archive:
+        shared = hashlib.sha1()
+        for part in ('xl/sharedStrings.xml', 'xl/styles.xml'):
+            if part in archive.NameToInfo:
+                shared.update(archive.read(part))
+        for name, part in parts.items():
+            digest = shared.copy()
+            digest.update(repr(sheet_layout(year, name)).encode('utf-8'))
+            digest.update(archive.read(part.lstrip('/')))
+            fingerprints[name] = digest.hexdigest()
+    return fingerprints
+
+def block_fingerprint(rows, colors, group_rows, cols):
+    """Hash of the group numbers and the cells (values and colours) of one date block."""
+    cells = [(group, [rows[i][c] for c in cols], [colors[i][c] for c in cols]) for i, group in group_rows]
+    return hashlib.sha1(repr(cells).encode('utf-8')).hexdigest()
+
+def parse_sheet(file_path, year, sheet_name, layout, blocks=None):
+    """
+    Parses one schedule sheet (days in columns, groups in rows) into entries
+    tagged with the year and the semester taken from the sheet name.
+
+    `blocks` maps dates to (fingerprint, entries) from an earlier parse; dates whose
+    cells have the same fingerprint reuse those entries instead of being extracted
+    again. Returns (entries, blocks) with the blocks of this parse.
+    Runs in a worker process, so it only takes picklable arguments.
+    """
+    blocks = blocks or {}
+    # Arkusz czytany jest strumieniowo tylko raz: wartości, kolory i scalenia.
+    try:
+        wb = load_workbook(file_path, data_only=True, read_only=True)
+        sheet = wb[sheet_name]
+        raw_values, colors = read_sheet(sheet)
+        merged_lookup = build_merged_lookup(read_merged_ranges(sheet))
+        wb.close()
+    except Exception as e:
+        print(f"Error reading Excel file: {e}")
+        return [], {}
+
+    grid = locate_grid(raw_values, layout)
+    if grid is None:
+        return [], {}
+    group_col, first_group_row, col_to_date_map = grid
+
+    #  --- Inteligentne wypełnianie na podstawie scalonych komórek z pliku XLSX ---
+    # Mapa komórka -> komórka główna budowana jest raz, dzięki czemu wartości
+    # i kolory komórek scalonych odczytujemy w O(1) zamiast przeszukiwać wszystkie zakresy.
+    rows, colors = fill_merged_cells(raw_values, colors, merged_lookup)
+
+    # Wiersze w read_only mogą mieć różne długości; dopełniamy je, by indeksy kolumn były bezpieczne
+    width = max(col_to_date_map, default=0) + 1
+    for grid_rows in (rows, colors):
+        for row in grid_rows:
+            if len(row) < width:
+                row.extend([None] * (width - len(row)))
+
+    group_rows = find_group_rows(rows, group_col, first_group_row)
+    cols_by_date = {}
+    for col, day in col_to_date_map.items():
+        cols_by_date.setdefault(day.date(), []).append(col)
+
+    # Bloki dni, których komórki się nie zmieniły, bierzemy z poprzedniego parsowania
+    new_blocks, changed_cols = {}, {}
+    for day, cols in cols_by_date.items():
+        fingerprint = block_fingerprint(rows, colors, group_rows, cols)
+        cached = blocks.get(day)
+        if cached is not None and cached[0] == fingerprint:
+            new_blocks[day] = cached
+        else:
+            new_blocks[day] = (fingerprint, [])
+            changed_cols.update((col, col_to_date_map[col]) for col in cols)
+
+    if changed_cols:
+        for entry in extract_entries(rows, colors, group_col, first_group_row, changed_cols):
+            new_blocks[entry['date']][1].append(entry)
+
+    # Kolejność jak przy przejściu arkusza wiersz po wierszu: grupa, potem dzień
+    group_order = {}
+    for _, group in group_rows:
+        group_order.setdefault(str(group), len(group_order))
+    entries = [entry for day in sorted(new_blocks) for entry in new_blocks[day][1]]
+    entries.sort(key=lambda entry: group_order[entry['group_number']])
+
+    semester = semester_of(sheet_name)
+    for entry in entries:
+        entry['year'] = year
+        entry['semester'] = semester
+    return entries, new_blocks
+
+def parse_workbooks(workbooks, cache=None):
+    """
+    Parses every schedule sheet of the given {year: file_path} workbooks and
+    returns {year: entries}. Sheets are parsed in a process pool when there is
+    more than one and more than one CPU, so a refresh of all years costs about as much as the
+    slowest sheet rather than their sum.
+
+    With a ParseCache, sheets whose fingerprint is unchanged are not read at all
+    and only the changed date blocks of the other sheets are extracted again.
+    """
+    tasks, reused = [], []
+    for year, file_path in workbooks.items():
         try:
-            group_number = int(group_number)
-        except (ValueError, TypeError):
+            sheets = schedule_sheets(file_path, year)
+        except Exception as e:
+            print(f"Error reading Excel file for year {year}: {e}")
             continue
+        if not sheets:
+            print(f"No schedule sheets found for year {year}.")
+        if cache is not None:
+            cache.retain(year, sheets)
+        for sheet_name, fingerprint in sheets.items():
+            state = cache.get(year, sheet_name) if cache is not None else None
+            if state is not None and state['fingerprint'] == fingerprint:
+                reused.append((year, state['entries']))
+                continue
+            blocks = state['blocks'] if state is not None else {}
+            tasks.append((file_path, year, sheet_name, sheet_layout(year, sheet_name), blocks, fingerprint))
+
+    if len(tasks) > 1 and PARSE_WORKERS > 1:
+        context = multiprocessing.get_context(POOL_START_METHOD)
+        if POOL_START_METHOD == 'forkserver':
+            # Procesy powstają z serwera, który ma już zaimportowane pandas i openpyxl
+            context.set_forkserver_preload([__name__])
+        with ProcessPoolExecutor(max_workers=min(len(tasks), PARSE_WORKERS), mp_context=context) as pool:
+            results = list(pool.map(parse_sheet, *zip(*(task[:5] for task in tasks))))
+    else:
+        results = [parse_sheet(*task[:5]) for task in tasks]
+
+    entries_by_year = {}
+    for year, entries in reused:
+        entries_by_year.setdefault(year, []).extend(entries)
+    for (_, year, sheet_name, _, old_blocks, sheet_fingerprint), (entries, blocks) in zip(tasks, results):
+        entries_by_year.setdefault(year, []).extend(entries)
+        if cache is not None and entries:
+            cache.put(year, sheet_name, {'fingerprint': sheet_fingerprint, 'entries': entries, 'blocks': blocks})
+            reused_blocks = sum(1 for day, (fingerprint, _) in blocks.items()
+                                if day in old_blocks and old_blocks[day][0] == fingerprint)
+            cache.stats['blocks_reused'] += reused_blocks
+            cache.stats['blocks_parsed'] += len(blocks) - reused_blocks
+    if cache is not None:
+        cache.stats['sheets_reused'] += len(reused)
+        cache.stats['sheets_parsed'] += len(tasks)
+    return entries_by_year
 
-        for col_idx in range(first_date_col, len(row)):
-            cell_value = row[col_idx]
-
-            if pd.notna(cell_value) and str(cell_value).strip():
-                # Konwertujemy `cell_value` na string, aby reszta kodu w tym bloku
-                # (np. parse_time_range) działała poprawnie.
-                cell_value = str(cell_value)
-                current_date = col_to_date_map.get(col_idx)
-                if not current_date:
-                    continue
-
-                start_time_str, end_time_str = parse_time_range(cell_value)
-
-                if start_time_str and end_time_str:
-                    day_start_minutes = 7 * 60 -30               
-                    key = (current_date.date(), group_number)
-                    last_end = last_end_by_date_group.get(key, day_start_minutes)
-
-                   
-                   
-                    # Przetwarzanie czasu na minuty
-                    start_h, start_m = map(int, start_time_str.split(':'))
-                    end_h, end_m = map(int, end_time_str.split(':'))
-                    start_time_total_minutes = start_h * 60 + start_m
-                    end_time_total_minutes = end_h * 60 + end_m
-
-                    spacing_before = max(0, start_time_total_minutes - last_end)
-
-
-                    duration = end_time_total_minutes - start_time_total_minutes
-                    if duration < 0: continue # Sanity check
-                    # Obliczanie pustych slotów przed zajęciami (zakładając dzień od 7:30)
-                    
-
-                    subject = ' '.join(cell_value.replace('\n', ' ').split())
-                    POLISH_DAYS = {
-                        0: "PONIEDZIAŁEK",
-                        1: "WTOREK",
-                        2: "ŚRODA",
-                        3: "CZWARTEK",
-                        4: "PIĄTEK",
-                        5: "Sobota",
-                        6: "Niedziela"
-                    }
-
-                    day_name = POLISH_DAYS[current_date.weekday()]
-
-                    # Otwórz skoroszyt (tylko raz, poza pętlą – dodamy to niżej)
-                    # workbook = load_workbook(file_path, data_only=True)
-                    # sheet = workbook["semestr 11"]
-
-                    # Pobierz kolor komórki (zakładamy, że masz dostęp do ws[row][col])
-                    excel_row = index + 1  # openpyxl używa indeksowania od 1
-                    excel_col_letter = get_column_letter(col_idx + 1)
-                    cell_ref = f"{excel_col_letter}{excel_row}"
+def load_and_process_data_rok6(file_path):
+    """
+    Loads and processes the schedule of the 6th year.
+    The schedule is laid out horizontally (days in columns).
+    """
+    return parse_workbooks({6: file_path}).get(6, [])
 
-                    color = None
-                    try:
-                        # sheet musi być zdefiniowany przed pętlą – dodamy to niżej
-                        cell = sheet[cell_ref]
-                        color = get_cell_color(cell, sheet)
-                    except Exception:
-                        color = None
-
-                    entry = {
-                        'date': current_date.date(),
-                        'day': day_name,
-                        'group_number': str(group_number),
-                        'subject': subject,
-                        'start_time_formatted': f"{start_time_total_minutes//60:02d}:{start_time_total_minutes%60:02d}",
-                        'end_time_formatted': f"{(start_time_total_minutes+duration)//60:02d}:{(start_time_total_minutes+duration)%60:02d}",
-                        'duration': duration,
-                        'spacing_before': spacing_before,
-                        'background_color': color or "#FFD966"  # domyślny kolor, jeśli brak
-                    }
-
-                    all_entries.append(entry)
-
-                    last_end_by_date_group[key] = end_time_total_minutes
-
-    return all_entries
-
-
-def get_last_update_info():
-    """Reads the last update date and URL from the log file."""
-    try:
-        with open('last_update.txt', 'r') as f:
-            line = f.readline().strip()
-            if '|' in line:
-                return line.split('|')
-            return line, ""
-    except FileNotFoundError:
-        return None, None
 
 def save_last_update_info(date_str, url):
     """Saves the new update date and URL to the log file."""
     with open('last_update.txt', 'w') as f:
         f.write(f"{date_str}|{url}")
 
-def main():
-    """Main function to check for updates, download, process, and save schedule data."""
+def load_validators(meta, name, url):
+    """Returns the ETag/Last-Modified stored for `name`, if they were recorded for the same URL."""
     try:
-        response = requests.get(CHECK_URL)
+        validators = json.loads(meta.get(f'{name}_validators') or '{}')
+    except ValueError:
+        return {}
+    return validators if validators.get('url') == url else {}
+
+def response_validators(response, url):
+    """Extracts the HTTP validators worth storing from a 200 response."""
+    return json.dumps({
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    })
+
+def conditional_get(url, validators):
+    """
+    GET with If-None-Match / If-Modified-Since built from stored validators.
+    Returns the response, whose status is either 200 or 304 (Not Modified).
+    """
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code != 304:
         response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Error fetching the website: {e}")
-        return
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Find the link for the 6th year schedule
-    schedule_link_tag = soup.find('a', href=lambda h: h and 'VI%20rok' in h)
-
-    if not schedule_link_tag:
-        print("Could not find the schedule link for the 6th year.")
-        return
-
-    link = schedule_link_tag['href']
-
-    # The update text is usually within a span or the link itself. Let's find the closest description.
-    update_text = schedule_link_tag.find_parent('tr').get_text(strip=True)
-    date_match = re.search(r'(\d{1,2}\.\d{1,2}\.\d{4})', update_text)
-
-
-
-
-    if date_match:
-        update_date_str = date_match.group(1)
-
-    if not update_date_str:
-        print("Could not parse update date from website.")
-        # Fallback to current date to ensure it runs at least once
-        update_date_str = datetime.now().strftime('%d.%m.%Y')
+    return response
+
+def roman_to_int(numeral):
+    total = 0
+    for char, next_char in zip(numeral, numeral[1:] + ' '):
+        value = ROMAN_VALUES[char]
+        total += -value if ROMAN_VALUES.get(next_char, 0) > value else value
+    return total
+
+def find_schedule_sources(soup):
+    """Returns a ScheduleSource for every year linked on the listing page, ordered by year."""
+    sources = {}
+    for tag in soup.find_all('a', href=True):
+        match = YEAR_LINK_PATTERN.search(unquote(tag['href']))
+        if not match:
+            continue
+        year = roman_to_int(match.group(1).upper())
+        if year in sources:
+            continue
 
-    last_date, last_url = get_last_update_info()
+        # The update text is usually within the table row of the link.
+        update_text = (tag.find_parent('tr') or tag).get_text(strip=True)
+        date_match = re.search(r'(\d{1,2}\.\d{1,2}\.\d{4})', update_text)
+        if date_match:
+            update_date_str = date_match.group(1)
+        else:
+            print(f"Could not parse update date for year {year} from website.")
+            # Fallback to current date to ensure it runs at least once
+            update_date_str = datetime.now().strftime('%d.%m.%Y')
+        sources[year] = ScheduleSource(year, tag['href'], update_date_str)
+    return [sources[year] for year in sorted(sources)]
+
+def download_path(year):
+    """Local path of a year's workbook; the default year keeps the original file name."""
+    if year == schedule_db.DEFAULT_YEAR:
+        return FILE_PATH
+    root, ext = os.path.splitext(FILE_PATH)
+    return f"{root}_rok{year}{ext}"
+
+def download_source(source, meta):
+    """
+    Downloads one year's workbook unless the server or its hash says it is unchanged.
+    Returns a dict with 'status' ('new', 'not_modified', 'identical' or 'error'), the
+    plan_meta items to store once the year is handled, and the file 'content' if new.
+    """
+    url = DOWNLOAD_BASE_URL + source.link
+    name = f'xlsx_{source.year}'
+    print(f"Downloading from: {url}")
+    try:
+        response = conditional_get(url, load_validators(meta, name, url))
+    except requests.RequestException as e:
+        return {'status': 'error', 'message': f"Error downloading the file for year {source.year}: {e}"}
+
+    items = {f'source_{source.year}': source.key}
+    if response.status_code == 304:
+        return {'status': 'not_modified', 'meta': items}
+
+    # Ten sam plik bywa publikowany ponownie z nową datą – wtedy nie parsujemy go od nowa
+    file_hash = hashlib.sha256(response.content).hexdigest()
+    items[f'{name}_validators'] = response_validators(response, url)
+    items[f'{name}_sha256'] = file_hash
+    if file_hash == meta.get(f'{name}_sha256'):
+        return {'status': 'identical', 'meta': items}
+    return {'status': 'new', 'meta': items, 'content': response.content}
+
+def save_display_update_info(sources):
+    """last_update.txt holds the update date shown on the page: the default year's, if listed."""
+    source = next((s for s in sources if s.year == schedule_db.DEFAULT_YEAR), sources[0])
+    save_last_update_info(source.update_date, source.link)
+
+def main(report=None):
+    """
+    Main function to check for updates, download, process, and save schedule data
+    of every year linked on the listing page. Only one update runs at a time for
+    a database: if another process holds the update lock, the run is skipped.
+    Returns an UpdateReport with the outcome, phase timings and row counts.
+    """
+    report = report or UpdateReport()
+    owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    if not schedule_db.acquire_lock('update', owner, UPDATE_LOCK_TTL, DB_PATH):
+        return report.finish('skipped', "Another update is already running. Skipped.")
+    try:
+        report = check_and_update(report)
+        if report.outcome == 'unchanged':
+            # Widoki bieżącej wersji mogły się nie zbudować przy publikacji (błąd, baza sprzed
+            # ich wprowadzenia); wersje już zbudowane build_* pomijają od razu
+            version = schedule_db.read_meta(DB_PATH).get('version')
+            if version:
+                build_render_artifacts(report, int(version))
+        return report
+    finally:
+        schedule_db.release_lock('update', owner, DB_PATH)
+
+def build_render_artifacts(report, version):
+    """Builds the week views and printable pages of a plan version, unless already built."""
+    with report.phase('render'):
+        try:
+            # Gotowe widoki tygodni dla każdej grupy – index() tylko je odczytuje
+            report.rows['artifacts'] = artifacts.build_artifacts(version, DB_PATH)
+        except Exception as e:
+            print(f"Error building render artifacts: {e}")
+        try:
+            # Wydruk całego semestru każdej grupy; żądanie nigdy go nie renderuje
+            report.rows['printables'] = artifacts.build_printables(version, DB_PATH)
+        except Exception as e:
+            print(f"Error building printable schedules: {e}")
 
-    if last_date != update_date_str or last_url != link:
-        print("New schedule update detected. Downloading and processing...")
-        
-        
-        download_url = 'https://www.ur.edu.pl/' + link
-        
+def check_and_update(report):
+    """Runs one update under the update lock; see main()."""
+    meta = schedule_db.read_meta(DB_PATH)
+    errors = []
 
-        print(f"Downloading from: {download_url}")
-        
+    with report.phase('fetch'):
         try:
-            file_response = requests.get(download_url)
-            file_response.raise_for_status()
-            with open(FILE_PATH, 'wb') as f:
-                f.write(file_response.content)
+            response = conditional_get(CHECK_URL, load_validators(meta, 'listing', CHECK_URL))
         except requests.RequestException as e:
-            print(f"Error downloading the file: {e}")
-            return
-
-        # Use the new processing function
-        processed_data = load_and_process_data_rok6(FILE_PATH)
+            return report.finish('error', f"Error fetching the website: {e}")
+
+        if response.status_code == 304:
+            return report.finish('unchanged', "Schedule listing not modified. No changes were made.")
+
+        listing_meta = {'listing_validators': response_validators(response, CHECK_URL)}
+        new_meta = {}
+
+        soup = BeautifulSoup(response.text, 'html.parser')
+        sources = find_schedule_sources(soup)
+
+        if not sources:
+            return report.finish('error', "Could not find any schedule links.")
+
+        changed = [source for source in sources if meta.get(f'source_{source.year}') != source.key]
+
+        if not changed:
+            schedule_db.write_meta(listing_meta, DB_PATH)
+            save_display_update_info(sources)
+            return report.finish('unchanged', "Schedule is up to date. No changes were made.")
+
+        print(f"New schedule update detected for years {[source.year for source in changed]}. "
+              "Downloading and processing...")
+
+        with ThreadPoolExecutor(max_workers=min(len(changed), DOWNLOAD_WORKERS)) as pool:
+            downloads = list(pool.map(lambda source: download_source(source, meta), changed))
+
+        workbooks, pending_meta = {}, {}
+        for source, download in zip(changed, downloads):
+            if download['status'] == 'error':
+                print(download['message'])
+                errors.append(download['message'])
+            elif download['status'] == 'new':
+                path = download_path(source.year)
+                with open(path, 'wb') as f:
+                    f.write(download['content'])
+                workbooks[source.year] = path
+                pending_meta[source.year] = download['meta']
+            else:
+                new_meta.update(download['meta'])
+
+        # Walidatory listy zapisujemy tylko, gdy wszystkie lata się udały – inaczej
+        # kolejne uruchomienie dostałoby 304 i nie ponowiłoby nieudanego pobrania
+        if not errors:
+            new_meta.update(listing_meta)
+
+        if not workbooks:
+            schedule_db.write_meta(new_meta, DB_PATH)
+            if errors:
+                return report.finish('error', " ".join(errors))
+            save_display_update_info(sources)
+            return report.finish('unchanged', "Schedule files not modified. No changes were made.")
+
+    with report.phase('parse'):
+        parse_cache = ParseCache.load(PARSE_CACHE_PATH, PARSE_CACHE_VERSION)
+        entries_by_year = parse_workbooks(workbooks, parse_cache)
+        try:
+            parse_cache.save()
+        except OSError as e:
+            print(f"Error saving parse cache: {e}")
+    report.rows.update(parse_cache.stats)
+
+    processed_data, years = [], []
+    for year in workbooks:
+        entries = entries_by_year.get(year)
+        if entries:
+            processed_data.extend(entries)
+            years.append(year)
+            new_meta.update(pending_meta[year])
+        else:
+            errors.append(f"No data processed for year {year}.")
+    report.rows['parsed'] = len(processed_data)
 
-        if not processed_data:
-            print("No data processed. Aborting database update.")
-            return
+    if not processed_data:
+        schedule_db.write_meta(new_meta, DB_PATH)
+        return report.finish('error', "No data processed. Aborting database update.")
 
-        df_to_save = pd.DataFrame(processed_data)
-        
+    with report.phase('publish'):
         try:
-            engine = create_engine(DB_URL)
-            df_to_save.to_sql(TABLE_NAME, engine, if_exists='replace', index=False)
-            save_last_update_info(update_date_str, link)
-            print(f"Successfully processed and saved {len(df_to_save)} entries to the database.")
+            # Zapisywane są tylko różnice względem poprzedniego planu tych lat, w jednej transakcji
+            result = schedule_db.publish_entries(processed_data, DB_PATH, meta=new_meta, years=years)
         except Exception as e:
-            print(f"Error saving data to database: {e}")
-            
-    else:
-        print("Schedule is up to date. No changes were made.")
+            return report.finish('error', f"Error saving data to database: {e}")
+        save_display_update_info(sources)
+    report.rows.update(inserted=result['inserted'], deleted=result['deleted'], total=result['total'])
+    report.plan_version = result['version']
+
+    build_render_artifacts(report, result['version'])
+    message = (f"Successfully processed and saved {result['total']} entries of years {years} to the database "
+               f"(plan version {result['version']}: {result['inserted']} inserted, {result['deleted']} deleted).")
+    if errors:
+        message += " Skipped: " + " ".join(errors)
+    return report.finish('updated', message)
 
 if __name__ == '__main__':
     main()